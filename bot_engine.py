@@ -13,6 +13,7 @@ Orchestrates:
 
 from typing import List, Dict, Optional, Any, Callable
 from datetime import datetime
+from cachetools import TTLCache
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
 from langchain_core.tools import tool
@@ -23,7 +24,7 @@ from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.documents import Document
-from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
 
 from config import (
     api_keys,
@@ -81,8 +82,13 @@ class LangChainEngine:
         logger.info(f"      Top-K: {rag_config.TOP_K}, History-aware: enabled")
 
         logger.info("[4/5] Session Store...")
-        self.session_store: Dict[int, ChatMessageHistory] = {}
+        # Limitato: LRU oltre MAX_SESSIONS, scadenza dopo SESSION_IDLE_TTL di inattività
+        self.session_store: TTLCache = TTLCache(
+            maxsize=memory_config.MAX_SESSIONS,
+            ttl=memory_config.SESSION_IDLE_TTL
+        )
         logger.info(f"      Summary buffer threshold: {memory_config.MAX_TOKENS_BEFORE_SUMMARY} tokens")
+        logger.info(f"      Max sessions: {memory_config.MAX_SESSIONS}, idle TTL: {memory_config.SESSION_IDLE_TTL:.0f}s")
 
         logger.info("[5/5] Tools + LLM binding...")
         self.tools = self._setup_tools()
@@ -189,13 +195,9 @@ class LangChainEngine:
 
             retriever: Any  # Il nostro Retriever custom
 
-            def _get_relevant_documents(
-                self, query: str, *, run_manager: CallbackManagerForRetrieverRun
-            ) -> List[Document]:
-                """Retrieval documenti."""
-                results = self.retriever.retrieve(query=query)
-
-                # Convert results to LangChain Documents
+            @staticmethod
+            def _to_documents(results: List[Dict[str, Any]]) -> List[Document]:
+                """Convert results to LangChain Documents."""
                 documents = []
                 for res in results:
                     doc = Document(
@@ -210,6 +212,18 @@ class LangChainEngine:
 
                 return documents
 
+            def _get_relevant_documents(
+                self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+            ) -> List[Document]:
+                """Retrieval documenti."""
+                return self._to_documents(self.retriever.retrieve(query=query))
+
+            async def _aget_relevant_documents(
+                self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+            ) -> List[Document]:
+                """Retrieval documenti (embedding + ChromaDB fuori dall'event loop)."""
+                return self._to_documents(await self.retriever.retrieve_async(query=query))
+
         # Create wrapper instance
         wrapped_retriever = CustomRetrieverWrapper(retriever=self.retriever)
 
@@ -282,11 +296,19 @@ class LangChainEngine:
         Returns:
             ChatMessageHistory per questo utente
         """
-        if user_id not in self.session_store:
-            self.session_store[user_id] = ChatMessageHistory()
+        history = self.session_store.get(user_id)
+        if history is None:
+            history = ChatMessageHistory()
             logger.debug(f"[SESSION] Created new history for user {user_id}")
 
-        return self.session_store[user_id]
+        # Re-inserimento a ogni uso: rinnova la scadenza (TTL = inattività)
+        self.session_store[user_id] = history
+        return history
+
+    def active_user_count(self) -> int:
+        """Numero conversazioni in memoria (esclude quelle scadute per inattività)."""
+        self.session_store.expire()
+        return len(self.session_store)
 
     def _apply_summary_buffer(self, messages: List, max_tokens: int = None) -> List:
         """
@@ -343,9 +365,7 @@ class LangChainEngine:
             )
 
             summary_response = summary_llm.invoke([
-                HumanMessage(content=prompts.SUMMARIZE_CONVERSATION_PROMPT.format(
-                    conversation=old_content
-                ))
+                HumanMessage(content=prompts.summarize_conversation_prompt(old_content))
             ])
 
             summary_message = SystemMessage(
@@ -404,7 +424,7 @@ class LangChainEngine:
             else:
                 # Fallback: retrieval normale senza history
                 logger.debug(f"[RAG TOOL] Using standard retriever (no history)")
-                results = self.retriever.retrieve(query=query, k=rag_config.TOP_K)
+                results = await self.retriever.retrieve_async(query=query, k=rag_config.TOP_K)
 
                 if not results:
                     return prompts.RAG_NO_CONTEXT_PROMPT
@@ -412,19 +432,14 @@ class LangChainEngine:
                 context = self.retriever.format_context(results)
 
             # Genera risposta con contesto
-            augmented_prompt = prompts.RAG_QUERY_PROMPT.format(
-                context=context,
-                query=query
-            )
+            augmented_prompt = prompts.rag_query_prompt(context, query)
 
             response_message = await self.llm.ainvoke([HumanMessage(content=augmented_prompt)])
 
             return response_message.content
 
         except Exception as e:
-            logger.error(f"[RAG TOOL ERROR] {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"[RAG TOOL ERROR] {e}")
             return f"Errore nella ricerca documenti: {str(e)}"
 
     async def process_message(
@@ -549,9 +564,7 @@ class LangChainEngine:
             return final_response
 
         except Exception as e:
-            logger.error(f"[ERROR] {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"[ERROR] {e}")
             return f"Mi dispiace, si è verificato un errore: {str(e)[:200]}"
 
     async def _execute_tool(self, tool_name: str, tool_args: dict) -> str:
@@ -578,9 +591,7 @@ class LangChainEngine:
             return f"Errore: Tool '{tool_name}' non trovato"
 
         except Exception as e:
-            logger.error(f"[TOOL ERROR] {tool_name}: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"[TOOL ERROR] {tool_name}: {e}")
             return f"Errore nell'esecuzione di {tool_name}: {str(e)}"
 
     def refresh_agent(self):
@@ -600,9 +611,7 @@ class LangChainEngine:
             logger.info(f"[REFRESH] Tools: {len(self.tools)}, Docs: {len(self.vector_store.list_all_documents())}")
 
         except Exception as e:
-            logger.error(f"[REFRESH] Failed: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"[REFRESH] Failed: {e}")
 
     def clear_memory(self, user_id: int):
         """Cancella memoria conversazione per user_id."""
@@ -17,27 +17,58 @@ Gli studenti possono modificare questo file per personalizzare:
 # MUST be BEFORE any chromadb imports
 # Necessario per alcuni sistemi con SQLite < 3.35.0
 # ============================================
+import io
 import sys
+
+
+def _configure_stdout() -> None:
+    """
+    Forza stdout UTF-8 (emoji nei log su console Windows). Chiamata una volta all'import.
+
+    Unico punto del progetto che riconfigura stdout: con PYTHONUTF8=1 (o
+    PYTHONIOENCODING=utf-8) l'encoding è già corretto e non si tocca nulla.
+    """
+    encoding = getattr(sys.stdout, 'encoding', None) or ''
+    if encoding.lower().replace('-', '') == 'utf8':
+        return
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+    except (AttributeError, io.UnsupportedOperation):
+        pass
+
+
+_configure_stdout()
+
 try:
     __import__('pysqlite3')
     sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
-    sys.stdout.reconfigure(encoding='utf-8') if hasattr(sys.stdout, 'reconfigure') else None
     print("[OK] SQLite workaround attivato (pysqlite3)")
 except ImportError:
-    sys.stdout.reconfigure(encoding='utf-8') if hasattr(sys.stdout, 'reconfigure') else None
     print("[WARN] pysqlite3 non trovato, uso sqlite3 di sistema")
 
 # ============================================
 # Imports Standard
 # ============================================
 import os
-from typing import List
+from typing import FrozenSet
 from dotenv import load_dotenv
 
 # Carica variabili d'ambiente da file .env (se esiste)
 load_dotenv()
 
 
+def _int_env(key: str, default: int) -> int:
+    """Legge un intero da env; se non impostato usa direttamente il default (niente parsing)."""
+    value = os.environ.get(key)
+    return int(value) if value is not None else default
+
+
+def _float_env(key: str, default: float) -> float:
+    """Legge un float da env; se non impostato usa direttamente il default (niente parsing)."""
+    value = os.environ.get(key)
+    return float(value) if value is not None else default
+
+
 # ============================================
 # API Keys (REQUIRED)
 # ============================================
@@ -90,12 +121,13 @@ class AdminConfig:
     - Vedere statistiche sistema (/stats)
     - Gestire il database
     """
-    # Lista user IDs admin (comma-separated in .env)
-    ADMIN_USER_IDS: List[int] = [
+    # User IDs admin (comma-separated in .env), frozenset: lookup O(1)
+    ADMIN_USER_IDS: FrozenSet[int] = frozenset(
         int(uid.strip())
         for uid in os.getenv("ADMIN_USER_IDS", "").split(",")
         if uid.strip().isdigit()
-    ]
+    )
+    ADMIN_COUNT: int = len(ADMIN_USER_IDS)
 
     @classmethod
     def is_admin(cls, user_id: int) -> bool:
@@ -134,6 +166,10 @@ class BotConfig:
     # Concurrent updates (gestione utenti simultanei)
     CONCURRENT_UPDATES: bool = True
 
+    # Bot API server self-hosted (es: http://localhost:8081), vuoto = api.telegram.org.
+    # In local mode i file caricati si leggono dal disco del server: niente download HTTP
+    LOCAL_BOT_API_URL: str = os.getenv("TELEGRAM_LOCAL_API_URL", "").rstrip("/")
+
 
 # ============================================
 # LLM Configuration
@@ -151,7 +187,7 @@ class LLMConfig:
     MODEL: str = os.getenv("LLM_MODEL", "gpt-4o-mini")
 
     # Temperature (creatività)
-    TEMPERATURE: float = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+    TEMPERATURE: float = _float_env("LLM_TEMPERATURE", 0.7)
 
     # Max tokens per risposta
     MAX_TOKENS: int = 1000
@@ -168,6 +204,9 @@ class LLMConfig:
     # Max caratteri TTS per singola request (limite OpenAI: 4096)
     TTS_MAX_CHARS: int = 4000
 
+    # Max chiamate OpenAI async in parallelo (Vision, sommari documenti)
+    MAX_CONCURRENCY: int = _int_env("LLM_MAX_CONCURRENCY", 20)
+
 
 # ============================================
 # RAG Configuration
@@ -191,22 +230,36 @@ class RAGConfig:
     # Embedding model
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
 
+    # Dimensioni embedding ridotte (modelli text-embedding-3, 0 = native: 1536/3072)
+    # Es: 512 → vector DB ~3x più piccolo con perdita di recall minima.
+    # ATTENZIONE: cambiarlo richiede di ricreare la collection e ricaricare i documenti
+    EMBEDDING_DIMENSIONS: int = _int_env("EMBEDDING_DIMENSIONS", 0)
+
     # Document chunking
-    CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "800"))
-    CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "100"))
+    CHUNK_SIZE: int = _int_env("CHUNK_SIZE", 800)
+    CHUNK_OVERLAP: int = _int_env("CHUNK_OVERLAP", 100)
 
     # Retrieval - numero di chunks da recuperare per ogni query
-    TOP_K: int = int(os.getenv("RAG_TOP_K", "5"))
+    TOP_K: int = _int_env("RAG_TOP_K", 5)
 
     # Collection name in ChromaDB
     COLLECTION_NAME: str = "documents"
 
-    # Similarity threshold per filtering (ChromaDB usa cosine distance: 0=identico, 2=opposto)
+    # Similarity threshold per filtering su cosine distance (1 - cos: 0=identico, 2=opposto)
+    # VectorStoreManager converte le distanze in cosine distance qualunque sia lo
+    # spazio HNSW della collection ("l2" vecchie, "ip" nuove): il filtro è cos >= 1 - threshold
     # STUDENTI: Threshold su distance (non score!). Valori tipici:
-    #   - 0.7: Solo risultati molto simili (potrebbe essere troppo restrittivo)
-    #   - 1.0-1.5: Buon bilanciamento per la maggior parte dei casi
+    #   - 0.5: Solo risultati molto simili (potrebbe essere troppo restrittivo)
+    #   - 0.7-0.8: Buon bilanciamento per la maggior parte dei casi
+    #   - 1.0: Scarta solo i chunk non correlati (cos < 0)
     #   - 2.0: Accetta praticamente tutto
-    SIMILARITY_THRESHOLD: float = 1.5
+    # Default 0.75 (cos >= 0.25) = il vecchio 1.5 su distanza L2 al quadrato
+    SIMILARITY_THRESHOLD: float = 0.75
+
+    # Cache query → risultati del Retriever
+    # Invalidata a ogni modifica dei documenti; TTL in secondi
+    QUERY_CACHE_SIZE: int = _int_env("RAG_QUERY_CACHE_SIZE", 2000)
+    QUERY_CACHE_TTL: float = _float_env("RAG_QUERY_CACHE_TTL", 300.0)
 
 
 # ============================================
@@ -244,7 +297,8 @@ class PathsConfig:
         ]
         for directory in directories:
             os.makedirs(directory, exist_ok=True)
-            print(f"[DIR] Verificata: {directory}")
+        # Un solo print (una sola write su stdout) per tutte le directory
+        print("\n".join(f"[DIR] Verificata: {directory}" for directory in directories))
 
 
 # ============================================
@@ -297,6 +351,11 @@ class MemoryConfig:
     # Token approssimativi per messaggio (usato per stima veloce)
     APPROX_TOKENS_PER_MESSAGE: int = 150
 
+    # Conversazioni tenute in RAM: oltre MAX_SESSIONS esce la meno recente (LRU),
+    # e una conversazione inattiva da SESSION_IDLE_TTL secondi viene scartata
+    MAX_SESSIONS: int = _int_env("MEMORY_MAX_SESSIONS", 5000)
+    SESSION_IDLE_TTL: float = _float_env("MEMORY_SESSION_IDLE_TTL", 86400.0)
+
 
 # ============================================
 # Feature Flags
@@ -362,9 +421,7 @@ def validate_config() -> bool:
     Returns:
         bool: True se configurazione valida
     """
-    print("\n" + "="*50)
-    print("[CONFIG] VALIDAZIONE CONFIGURAZIONE")
-    print("="*50)
+    print("\n" + "="*50 + "\n[CONFIG] VALIDAZIONE CONFIGURAZIONE\n" + "="*50)
 
     # Valida API keys
     if not api_keys.validate():
@@ -375,18 +432,20 @@ def validate_config() -> bool:
         print("[WARN] Nessun admin configurato! Aggiungi ADMIN_USER_IDS in .env")
         return False
 
-    print(f"[OK] Admin configurati: {len(admin_config.ADMIN_USER_IDS)}")
-    print(f"[OK] LLM Model: {llm_config.MODEL}")
-    print(f"[OK] Embedding Model: {rag_config.EMBEDDING_MODEL}")
-    print(f"[OK] RAG Top-K: {rag_config.TOP_K}")
-    print(f"[OK] Chunk Size: {rag_config.CHUNK_SIZE}")
+    # Riepilogo in un unico blocco: una write su stdout invece di una per riga
+    print("\n".join([
+        f"[OK] Admin configurati: {admin_config.ADMIN_COUNT}",
+        f"[OK] LLM Model: {llm_config.MODEL}",
+        f"[OK] Embedding Model: {rag_config.EMBEDDING_MODEL}",
+        f"[OK] RAG Top-K: {rag_config.TOP_K}",
+        f"[OK] Chunk Size: {rag_config.CHUNK_SIZE}",
+    ]))
 
     # Crea directories
     print("\n[INFO] Creazione directory...")
     paths_config.create_directories()
 
-    print("\n[OK] Configurazione valida!")
-    print("="*50 + "\n")
+    print("\n[OK] Configurazione valida!\n" + "="*50 + "\n", flush=True)
 
     return True
 
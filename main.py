@@ -27,25 +27,37 @@ Flow di avvio:
 """
 
 import sys
+import atexit
 import signal
 from src.utils.logger import main_logger, log_startup_info, log_shutdown_info
 
 # Import config (triggers SQLite workaround)
 import config
 
-# Validate configuration
-if not config.validate_config():
-    print("\n[ERROR] Configuration validation failed!")
-    print("        Check your .env file or Railway Environment Variables")
-    sys.exit(1)
+# NOTA: validazione config e import dei componenti sono dentro main().
+# I worker del pool PDF (forkserver/spawn) re-importano questo modulo come
+# __mp_main__: a livello modulo deve restare solo ciò che è leggero.
 
-# Imports dopo validazione config
-from bot_engine import LangChainEngine
-from src.rag.vector_store import VectorStoreManager
-from src.rag.document_processor import DocumentProcessor
-from src.telegram.bot_setup import create_bot
-from src.telegram.message_processor import MessageProcessor
-from src.telegram.handlers import setup_handlers
+
+def log_uncaught_exception(exc_type, exc_value, exc_tb):
+    """
+    Hook globale (sys.excepthook) per eccezioni non gestite.
+
+    Logga un unico traceback tramite main_logger; l'interprete termina
+    poi con exit code 1. KeyboardInterrupt usa l'hook di default.
+    """
+    if issubclass(exc_type, KeyboardInterrupt):
+        sys.__excepthook__(exc_type, exc_value, exc_tb)
+        return
+
+    main_logger.critical(
+        "\n[FATAL] Unhandled exception: %s",
+        exc_value,
+        exc_info=(exc_type, exc_value, exc_tb)
+    )
+
+
+sys.excepthook = log_uncaught_exception
 
 
 def initialize_components():
@@ -56,66 +68,66 @@ def initialize_components():
         Dict con tutti i componenti inizializzati
 
     Raises:
-        Exception: Se inizializzazione fallisce
+        Exception: Se inizializzazione fallisce (gestita da log_uncaught_exception)
     """
+    # Imports dopo validazione config (vedi main)
+    from bot_engine import LangChainEngine
+    from src.rag.vector_store import VectorStoreManager
+    from src.rag.document_processor import DocumentProcessor
+    from src.telegram.bot_setup import create_bot
+    from src.telegram.message_processor import MessageProcessor
+
     main_logger.info("\n" + "="*60)
     main_logger.info("INITIALIZING COMPONENTS")
     main_logger.info("="*60)
 
     components = {}
 
-    try:
-        # ========================================
-        # 1. Vector Store (ChromaDB)
-        # ========================================
-        main_logger.info("\n[1/5] Initializing Vector Store...")
-        vector_store = VectorStoreManager()
-        components['vector_store'] = vector_store
-        main_logger.info("[OK] Vector Store ready")
-
-        # ========================================
-        # 2. Document Processor
-        # ========================================
-        main_logger.info("\n[2/5] Initializing Document Processor...")
-        document_processor = DocumentProcessor()
-        components['document_processor'] = document_processor
-        main_logger.info("[OK] Document Processor ready")
-
-        # ========================================
-        # 3. LangChain Engine (CORE)
-        # ========================================
-        main_logger.info("\n[3/5] Initializing LangChain Engine...")
-        langchain_engine = LangChainEngine(vector_store)
-        components['langchain_engine'] = langchain_engine
-        main_logger.info("[OK] LangChain Engine ready")
-
-        # ========================================
-        # 4. Message Processor
-        # ========================================
-        main_logger.info("\n[4/5] Initializing Message Processor...")
-        message_processor = MessageProcessor(langchain_engine)
-        components['message_processor'] = message_processor
-        main_logger.info("[OK] Message Processor ready")
-
-        # ========================================
-        # 5. Telegram Bot
-        # ========================================
-        main_logger.info("\n[5/5] Initializing Telegram Bot...")
-        app = create_bot()
-        components['app'] = app
-        main_logger.info("[OK] Telegram Bot ready")
-
-        main_logger.info("\n" + "="*60)
-        main_logger.info("ALL COMPONENTS INITIALIZED SUCCESSFULLY")
-        main_logger.info("="*60 + "\n")
-
-        return components
+    # ========================================
+    # 1. Vector Store (ChromaDB)
+    # ========================================
+    main_logger.info("\n[1/5] Initializing Vector Store...")
+    vector_store = VectorStoreManager()
+    components['vector_store'] = vector_store
+    main_logger.info("[OK] Vector Store ready")
 
-    except Exception as e:
-        main_logger.error(f"\n[FATAL] Component initialization failed: {e}")
-        import traceback
-        traceback.print_exc()
-        sys.exit(1)
+    # ========================================
+    # 2. Document Processor
+    # ========================================
+    main_logger.info("\n[2/5] Initializing Document Processor...")
+    document_processor = DocumentProcessor()
+    components['document_processor'] = document_processor
+    main_logger.info("[OK] Document Processor ready")
+
+    # ========================================
+    # 3. LangChain Engine (CORE)
+    # ========================================
+    main_logger.info("\n[3/5] Initializing LangChain Engine...")
+    langchain_engine = LangChainEngine(vector_store)
+    components['langchain_engine'] = langchain_engine
+    main_logger.info("[OK] LangChain Engine ready")
+
+    # ========================================
+    # 4. Message Processor
+    # ========================================
+    main_logger.info("\n[4/5] Initializing Message Processor...")
+    message_processor = MessageProcessor(langchain_engine)
+    components['message_processor'] = message_processor
+    main_logger.info("[OK] Message Processor ready")
+
+    # ========================================
+    # 5. Telegram Bot
+    # ========================================
+    main_logger.info("\n[5/5] Initializing Telegram Bot...")
+    app = create_bot()
+    components['app'] = app
+    main_logger.info("[OK] Telegram Bot ready")
+
+    main_logger.info("\n" + "="*60)
+    main_logger.info("ALL COMPONENTS INITIALIZED SUCCESSFULLY")
+    main_logger.info("="*60 + "\n")
+
+    return components
 
 
 def setup_signal_handlers(components=None):
@@ -130,15 +142,7 @@ def setup_signal_handlers(components=None):
     def signal_handler(sig, frame):
         """Handler per CTRL+C con graceful shutdown"""
         main_logger.info("\n\n[SHUTDOWN] Received interrupt signal")
-
-        # Session store is in-memory, no need to save to disk
-        if components and 'langchain_engine' in components:
-            try:
-                session_count = len(components['langchain_engine'].session_store)
-                main_logger.info(f"[SHUTDOWN] Clearing {session_count} active session(s)...")
-                main_logger.info(f"[OK] Session store will be cleared on exit")
-            except Exception as e:
-                main_logger.error(f"[ERROR] Failed to check sessions: {e}")
+        main_logger.info("[SHUTDOWN] Cleaning up...")
 
         log_shutdown_info()
         sys.exit(0)
@@ -146,12 +150,24 @@ def setup_signal_handlers(components=None):
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
+    # Session store is in-memory, no need to save to disk.
+    # Il conteggio sessioni viene loggato via atexit, quando i worker
+    # asyncio sono fermi e nessuno modifica più il dict.
+    if components and 'langchain_engine' in components:
+        session_store = components['langchain_engine'].session_store
+
+        def log_session_count():
+            main_logger.info("[SHUTDOWN] Sessions cleared: %d", len(session_store))
+
+        atexit.register(log_session_count)
+
 
 def main():
     """
     Main function - entry point del bot.
 
     Steps:
+    0. Validate config
     1. Log startup info
     2. Setup signal handlers
     3. Initialize components
@@ -159,14 +175,22 @@ def main():
     5. Start polling
     6. Run forever (until CTRL+C)
     """
+    # Validate configuration
+    if not config.validate_config():
+        print("\n[ERROR] Configuration validation failed!")
+        print("        Check your .env file or Railway Environment Variables")
+        sys.exit(1)
+
+    from src.telegram.handlers import setup_handlers
+
     # ========================================
     # Startup
     # ========================================
     log_startup_info()
 
     main_logger.info("Starting Telegram Educational Bot with RAG...")
-    main_logger.info(f"Bot name: {config.bot_config.BOT_NAME}")
-    main_logger.info(f"Admins: {len(config.admin_config.ADMIN_USER_IDS)}")
+    main_logger.info("Bot name: %s", config.bot_config.BOT_NAME)
+    main_logger.info("Admins: %d", len(config.admin_config.ADMIN_USER_IDS))
 
     # ========================================
     # Initialize all components
@@ -182,7 +206,7 @@ def main():
     # Session store info (in-memory, no cleanup needed)
     # ========================================
     main_logger.info("[OK] Session store initialized (in-memory)")
-    main_logger.info(f"     Summary buffer threshold: {config.memory_config.MAX_TOKENS_BEFORE_SUMMARY} tokens")
+    main_logger.info("     Summary buffer threshold: %d tokens", config.memory_config.MAX_TOKENS_BEFORE_SUMMARY)
 
     # ========================================
     # Setup handlers
@@ -223,9 +247,7 @@ def main():
         )
 
     except Exception as e:
-        main_logger.error(f"\n[FATAL] Bot crashed: {e}")
-        import traceback
-        traceback.print_exc()
+        main_logger.exception("\n[FATAL] Bot crashed: %s", e)
         sys.exit(1)
 
 
@@ -11,34 +11,28 @@ Tips per modificare i prompts LLM:
 2. Includete esempi se necessario
 3. Definite il formato di output desiderato
 4. Testate sempre dopo le modifiche!
-"""
-
 
-class Prompts:
-    """
-    Classe centralizzata per tutti i prompt LLM del bot.
+I prompt sono costanti a livello di modulo (accesso diretto, niente classe).
 
-    Questi prompt guidano il comportamento dell'AI e vengono passati
-    direttamente ai modelli (ChatGPT, GPT-4o Vision, etc.).
+COSA MODIFICARE:
+- SYSTEM_PROMPT: Personalità, comportamento, istruzioni base
+- VISION_ANALYSIS_PROMPT: Come analizzare le immagini
+- RAG_QUERY_PROMPT: Come presentare i documenti recuperati
 
-    COSA MODIFICARE:
-    - SYSTEM_PROMPT: Personalità, comportamento, istruzioni base
-    - IMAGE_ANALYSIS_PROMPT: Come analizzare le immagini
-    - RAG_CONTEXT_TEMPLATE: Come presentare i documenti recuperati
+COSA NON MODIFICARE (a meno che non sia necessario):
+- Variabili placeholder come {context}, {query}, {caption}
+- Struttura generale dei template (usa .format() per sostituire variabili)
+"""
 
-    COSA NON MODIFICARE (a meno che non sia necessario):
-    - Variabili placeholder come {context}, {query}, {history}
-    - Struttura generale dei template (usa .format() per sostituire variabili)
+import sys
+from string import Formatter
 
-    Gli studenti possono modificare questi prompt per sperimentare
-    con diversi comportamenti e personalità del bot.
-    """
 
-    # =========================================
-    # SYSTEM PROMPTS
-    # =========================================
+# =========================================
+# SYSTEM PROMPTS
+# =========================================
 
-    SYSTEM_PROMPT = """Sei l'assistente virtuale di Develhope,creato da Vincenzo Orrei per la Data & AI Week.
+SYSTEM_PROMPT = """Sei l'assistente virtuale di Develhope,creato da Vincenzo Orrei per la Data & AI Week.
     Rispondi in maniera molto cordiale, propositiva e amichevole.
 
 CHI SEI:
@@ -80,11 +74,11 @@ TONO E STILE:
 - Risposte elaborate e conversazionali (evita risposte telegrafiche)
 """
 
-    # =========================================
-    # RAG PROMPTS
-    # =========================================
+# =========================================
+# RAG PROMPTS
+# =========================================
 
-    RAG_QUERY_PROMPT = """Sei un assistente educativo. Rispondi alla domanda dell'utente utilizzando principalmente le informazioni dai documenti forniti.
+RAG_QUERY_PROMPT = """Sei un assistente educativo. Rispondi alla domanda dell'utente utilizzando principalmente le informazioni dai documenti forniti.
 
 DOCUMENTI RILEVANTI:
 {context}
@@ -100,7 +94,7 @@ ISTRUZIONI:
 
 RISPOSTA:"""
 
-    RAG_NO_CONTEXT_PROMPT = """Non ho trovato informazioni rilevanti nei documenti caricati per rispondere a questa domanda.
+RAG_NO_CONTEXT_PROMPT = """Non ho trovato informazioni rilevanti nei documenti caricati per rispondere a questa domanda.
 
 Posso:
 1. Cercare informazioni sul web (se web search è abilitato)
@@ -109,11 +103,11 @@ Posso:
 
 Come preferisci procedere?"""
 
-    # =========================================
-    # WEB SEARCH PROMPTS
-    # =========================================
+# =========================================
+# WEB SEARCH PROMPTS
+# =========================================
 
-    WEB_SEARCH_PROMPT = """Basandoti sui risultati della ricerca web, rispondi alla domanda dell'utente.
+WEB_SEARCH_PROMPT = """Basandoti sui risultati della ricerca web, rispondi alla domanda dell'utente.
 
 RISULTATI RICERCA WEB:
 {web_results}
@@ -133,11 +127,11 @@ ISTRUZIONI:
 
 RISPOSTA:"""
 
-    # =========================================
-    # VISION PROMPTS
-    # =========================================
+# =========================================
+# VISION PROMPTS
+# =========================================
 
-    VISION_ANALYSIS_PROMPT = """Analizza questa immagine e descrivi dettagliatamente cosa vedi.
+VISION_ANALYSIS_PROMPT = """Analizza questa immagine e descrivi dettagliatamente cosa vedi.
 
 CONTESTO UTENTE: {caption}
 
@@ -154,7 +148,7 @@ Fornisci un'analisi strutturata includendo:
 
 Sii chiaro e pedagogico nella descrizione."""
 
-    VISION_QUESTION_PROMPT = """Basandoti su questa immagine, rispondi alla domanda dell'utente.
+VISION_QUESTION_PROMPT = """Basandoti su questa immagine, rispondi alla domanda dell'utente.
 
 DOMANDA: {question}
 
@@ -165,11 +159,11 @@ Analizza l'immagine attentamente e fornisci una risposta dettagliata e educativa
 - <i>corsivo</i> per enfasi (NON *testo*)
 - <code>code</code> per riferimenti specifici (NON `code`)"""
 
-    # =========================================
-    # HISTORY-AWARE & MEMORY PROMPTS
-    # =========================================
+# =========================================
+# HISTORY-AWARE & MEMORY PROMPTS
+# =========================================
 
-    CONTEXTUALIZE_QUERY_PROMPT = """Given a chat history and the latest user question which might reference context in the chat history,
+CONTEXTUALIZE_QUERY_PROMPT = """Given a chat history and the latest user question which might reference context in the chat history,
 formulate a standalone question which can be understood without the chat history.
 
 Do NOT answer the question, just reformulate it if needed and otherwise return it as is.
@@ -183,7 +177,7 @@ Latest question: {input}
 
 Standalone question:"""
 
-    SUMMARIZE_CONVERSATION_PROMPT = """Riassumi brevemente questa porzione di conversazione precedente,
+SUMMARIZE_CONVERSATION_PROMPT = """Riassumi brevemente questa porzione di conversazione precedente,
 mantenendo i punti chiave, informazioni importanti e contesto necessario per comprendere messaggi futuri.
 
 Conversazione da riassumere:
@@ -198,7 +192,97 @@ Crea un riassunto conciso (max 200 parole) che catturi:
 RIASSUNTO:"""
 
 
+# =========================================
+# INTERNING
+# =========================================
+# Una sola copia condivisa di ogni prompt nel processo (e nei worker forkati)
+
+SYSTEM_PROMPT = sys.intern(SYSTEM_PROMPT)
+RAG_QUERY_PROMPT = sys.intern(RAG_QUERY_PROMPT)
+RAG_NO_CONTEXT_PROMPT = sys.intern(RAG_NO_CONTEXT_PROMPT)
+WEB_SEARCH_PROMPT = sys.intern(WEB_SEARCH_PROMPT)
+VISION_ANALYSIS_PROMPT = sys.intern(VISION_ANALYSIS_PROMPT)
+VISION_QUESTION_PROMPT = sys.intern(VISION_QUESTION_PROMPT)
+CONTEXTUALIZE_QUERY_PROMPT = sys.intern(CONTEXTUALIZE_QUERY_PROMPT)
+SUMMARIZE_CONVERSATION_PROMPT = sys.intern(SUMMARIZE_CONVERSATION_PROMPT)
+
+
+# =========================================
+# PROMPT BUILDERS
+# =========================================
+# I template vengono splittati UNA volta all'import nei segmenti letterali
+# tra i placeholder: a runtime basta concatenarli (niente parsing di .format()).
+
+def _split_template(template: str, *fields: str) -> tuple:
+    """
+    Splitta un template nei segmenti letterali tra i placeholder.
+
+    Args:
+        template: Template con placeholder {campo}
+        *fields: Nomi dei placeholder attesi, in ordine
+
+    Returns:
+        Tuple di len(fields) + 1 segmenti letterali
+
+    Raises:
+        ValueError: Se i placeholder del template non corrispondono a fields
+    """
+    literals = []
+    found = []
+    for literal, field_name, _, _ in Formatter().parse(template):
+        literals.append(literal)
+        if field_name is not None:
+            found.append(field_name)
+
+    if tuple(found) != fields:
+        raise ValueError(f"Placeholder attesi {fields}, trovati {tuple(found)}")
+
+    # Template che termina con un placeholder: segmento finale vuoto
+    if len(literals) == len(fields):
+        literals.append("")
+
+    return tuple(sys.intern(literal) for literal in literals)
+
+
+_RAG_QUERY_PARTS = _split_template(RAG_QUERY_PROMPT, "context", "query")
+_WEB_SEARCH_PARTS = _split_template(WEB_SEARCH_PROMPT, "web_results", "query")
+_VISION_ANALYSIS_PARTS = _split_template(VISION_ANALYSIS_PROMPT, "caption")
+_VISION_QUESTION_PARTS = _split_template(VISION_QUESTION_PROMPT, "question")
+_SUMMARIZE_CONVERSATION_PARTS = _split_template(SUMMARIZE_CONVERSATION_PROMPT, "conversation")
+
+
+def rag_query_prompt(context: str, query: str) -> str:
+    """Equivalente a RAG_QUERY_PROMPT.format(context=..., query=...)."""
+    p = _RAG_QUERY_PARTS
+    return f"{p[0]}{context}{p[1]}{query}{p[2]}"
+
+
+def web_search_prompt(web_results: str, query: str) -> str:
+    """Equivalente a WEB_SEARCH_PROMPT.format(web_results=..., query=...)."""
+    p = _WEB_SEARCH_PARTS
+    return f"{p[0]}{web_results}{p[1]}{query}{p[2]}"
+
+
+def vision_analysis_prompt(caption: str = "") -> str:
+    """Equivalente a VISION_ANALYSIS_PROMPT.format(caption=...)."""
+    p = _VISION_ANALYSIS_PARTS
+    return f"{p[0]}{caption}{p[1]}"
+
+
+def vision_question_prompt(question: str) -> str:
+    """Equivalente a VISION_QUESTION_PROMPT.format(question=...)."""
+    p = _VISION_QUESTION_PARTS
+    return f"{p[0]}{question}{p[1]}"
+
+
+def summarize_conversation_prompt(conversation: str) -> str:
+    """Equivalente a SUMMARIZE_CONVERSATION_PROMPT.format(conversation=...)."""
+    p = _SUMMARIZE_CONVERSATION_PARTS
+    return f"{p[0]}{conversation}{p[1]}"
+
+
 # =========================================
 # EXPORTS
 # =========================================
-prompts = Prompts()
+# Compatibilità: "from prompts import prompts" + prompts.SYSTEM_PROMPT
+prompts = sys.modules[__name__]
@@ -10,16 +10,62 @@ IMPORTANTE per STUDENTI:
 - Usare solo se necessario (opt-in feature)
 """
 
-from typing import Optional
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+from itertools import islice
+from typing import BinaryIO, Iterator, Optional
+from tempfile import SpooledTemporaryFile
+
+from cachetools import LRUCache
 
 from config import llm_config
 from src.utils.logger import get_logger
-from src.utils.helpers import truncate_text
 from src.utils.shared_clients import get_openai_client
 
 logger = get_logger(__name__)
 
+# Dimensione blocchi letti dallo stream HTTP di OpenAI TTS
+STREAM_CHUNK_SIZE = 16384
+
+# Oltre questa soglia il buffer audio passa da RAM a file temporaneo su disco
+SPOOL_MAX_SIZE = 1024 * 1024
+
+# True se il testo contiene almeno un carattere non-spazio (si ferma al primo)
+_HAS_NON_WS = re.compile(r"\S").search
+
+# Confini di frase per generate_streaming
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?…])\s+")
+
+# Richieste TTS in parallelo in generate_streaming (= frasi bufferizzate al massimo)
+STREAM_CONCURRENCY = 4
+
+# Cache MP3 generati (testi ripetuti: messaggi fissi, fallback, saluti):
+# budget totale in bytes e dimensione massima del singolo audio in cache
+TTS_CACHE_MAX_BYTES = 16 * 1024 * 1024
+TTS_CACHE_MAX_ITEM_BYTES = 512 * 1024
+
+
+def _strip_id3(data: bytes) -> bytes:
+    """
+    Rimuove l'eventuale tag ID3v2 iniziale da un frammento MP3.
+
+    I frame MP3 si concatenano senza ricodifica: basta che solo il primo
+    frammento porti l'header ID3.
+    """
+    if len(data) < 10 or data[:3] != b"ID3":
+        return data
+
+    # Dimensione tag: 4 byte "syncsafe" (7 bit utili ciascuno) + header 10 byte
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    size += 10
+    if data[5] & 0x10:  # Footer presente
+        size += 10
+
+    return data[size:]
+
 
 class AudioGenerator:
     """
@@ -29,12 +75,12 @@ class AudioGenerator:
     1. Text-to-Speech con voce configurabile
     2. Gestione limite 4096 caratteri
     3. Output MP3 ottimizzato per Telegram
-    4. Caching opzionale (TODO)
+    4. Cache LRU degli audio brevi (stesso testo → nessuna nuova chiamata API)
 
     Example:
         >>> audio_gen = AudioGenerator()
-        >>> audio_bytes = audio_gen.generate("Hello world!")
-        >>> # Send to Telegram
+        >>> audio_file = audio_gen.generate("Hello world!")
+        >>> # Send to Telegram, then audio_file.close()
     """
 
     def __init__(
@@ -55,22 +101,48 @@ class AudioGenerator:
         self.model = model or llm_config.TTS_MODEL
         self.max_chars = llm_config.TTS_MAX_CHARS
 
-        logger.info(f"[INIT] AudioGenerator")
-        logger.info(f"       Voice: {self.voice}")
-        logger.info(f"       Model: {self.model}")
-        logger.info(f"       Max chars: {self.max_chars}")
+        logger.info("[INIT] AudioGenerator")
+        logger.info("       Voice: %s", self.voice)
+        logger.info("       Model: %s", self.model)
+        logger.info("       Max chars: %d", self.max_chars)
 
         # Use shared OpenAI client (evita duplicazioni)
         self.client = get_openai_client()
 
+        # Testo → MP3, limitata in bytes totali (voce e modello fissi per istanza)
+        self._cache: LRUCache = LRUCache(maxsize=TTS_CACHE_MAX_BYTES, getsizeof=len)
+        self._cache_lock = threading.Lock()
+
+    def _stream_speech(self, text: str) -> Iterator[bytes]:
+        """
+        Chiama OpenAI TTS in streaming e restituisce i blocchi MP3 man mano che arrivano.
+
+        Args:
+            text: Testo (già entro il limite API)
+
+        Yields:
+            Blocchi di bytes MP3
+        """
+        with self.client.audio.speech.with_streaming_response.create(
+            model=self.model,
+            voice=self.voice,
+            input=text,
+            response_format="mp3"
+        ) as response:
+            yield from response.iter_bytes(STREAM_CHUNK_SIZE)
+
     def generate(
         self,
         text: str,
         auto_truncate: bool = True
-    ) -> Optional[bytes]:
+    ) -> Optional[BinaryIO]:
         """
         Genera audio MP3 da testo.
 
+        L'audio viene letto in streaming in un SpooledTemporaryFile
+        (RAM fino a SPOOL_MAX_SIZE, poi disco) invece di materializzare
+        l'intera risposta HTTP in un unico oggetto bytes.
+
         ATTENZIONE:
         - OpenAI limit: 4096 caratteri
         - Se testo più lungo, viene troncato (se auto_truncate=True)
@@ -81,69 +153,116 @@ class AudioGenerator:
             auto_truncate: Se True, tronca automaticamente testo lungo
 
         Returns:
-            Bytes MP3 audio o None se errore
+            File-like MP3 (posizionato all'inizio) o None se errore.
+            Il chiamante deve chiuderlo dopo l'uso.
 
         Raises:
             ValueError: Se testo troppo lungo e auto_truncate=False
 
         Example:
-            >>> audio_bytes = audio_gen.generate("Hello, how are you?")
-            >>> with open("output.mp3", "wb") as f:
-            ...     f.write(audio_bytes)
+            >>> with audio_gen.generate("Hello, how are you?") as audio_file:
+            ...     await update.message.reply_voice(voice=audio_file)
         """
-        if not text or len(text.strip()) == 0:
+        if not text or not _HAS_NON_WS(text):
             logger.warning("[WARN] Empty text, skipping TTS")
             return None
 
-        # Check length
+        # Check length (limite OpenAI in caratteri: lo slicing non spezza mai un carattere)
         if len(text) > self.max_chars:
             if auto_truncate:
-                logger.warning(f"[WARN] Text too long ({len(text)} chars), truncating to {self.max_chars}")
-                text = truncate_text(text, max_tokens=self.max_chars, model="gpt-4o-mini")
+                logger.warning("[WARN] Text too long (%d chars), truncating to %d", len(text), self.max_chars)
+                text = text[:self.max_chars]
             else:
                 raise ValueError(
                     f"Text too long ({len(text)} chars). "
                     f"Max: {self.max_chars}. Use auto_truncate=True."
                 )
 
-        logger.info(f"[TTS] Generating audio for {len(text)} characters...")
+        with self._cache_lock:
+            cached = self._cache.get(text)
+        if cached is not None:
+            logger.info("[TTS] Cache hit (%d bytes MP3)", len(cached))
+            return BytesIO(cached)
+
+        logger.info("[TTS] Generating audio for %d characters...", len(text))
+
+        audio_file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
 
         try:
-            # Call OpenAI TTS API
-            response = self.client.audio.speech.create(
-                model=self.model,
-                voice=self.voice,
-                input=text,
-                response_format="mp3"
-            )
+            # Call OpenAI TTS API (streaming)
+            for chunk in self._stream_speech(text):
+                audio_file.write(chunk)
 
-            # Get audio bytes
-            audio_bytes = response.content
+            size = audio_file.tell()
+            audio_file.seek(0)
 
-            logger.info(f"[OK] Generated {len(audio_bytes)} bytes MP3")
-            return audio_bytes
+            # Audio brevi (ancora in RAM nello spool): copia in cache
+            if size <= TTS_CACHE_MAX_ITEM_BYTES:
+                data = audio_file.read()
+                audio_file.seek(0)
+                with self._cache_lock:
+                    self._cache[text] = data
+
+            logger.info("[OK] Generated %d bytes MP3", size)
+            return audio_file
 
         except Exception as e:
-            logger.error(f"[ERROR] TTS generation failed: {e}")
+            audio_file.close()
+            logger.error("[ERROR] TTS generation failed: %s", e)
             return None
 
-    def generate_streaming(self, text: str):
+    def _synthesize(self, text: str) -> bytes:
+        """Sintetizza un singolo segmento e restituisce l'MP3 completo."""
+        return b"".join(self._stream_speech(text))
+
+    def generate_streaming(self, text: str) -> Iterator[bytes]:
         """
         Genera audio in streaming (per testi molto lunghi).
 
-        NOTA: Implementazione futura per chunking automatico.
+        Il testo viene diviso in frasi; fino a STREAM_CONCURRENCY frasi sono
+        sintetizzate in parallelo (thread pool sul client condiviso) e
+        l'MP3 di ciascuna è restituito in ordine appena pronto. I frammenti
+        sono concatenati senza ricodifica (tag ID3 rimosso dopo il primo).
 
         Args:
             text: Testo lungo da convertire
 
         Yields:
-            Chunks di audio bytes
+            Audio MP3 di ogni frase, in ordine
         """
-        # TODO: Implementare streaming per testi > 4096 chars
-        # Splitta in chunks, genera audio per ognuno, concatena
-        raise NotImplementedError("Streaming TTS not yet implemented")
-
+        if not text or not _HAS_NON_WS(text):
+            logger.warning("[WARN] Empty text, skipping TTS")
+            return
+
+        # Frase singola oltre il limite: taglio a max_chars caratteri
+        sentences = iter([
+            sentence[:self.max_chars]
+            for sentence in _SENTENCE_SPLIT.split(text)
+            if _HAS_NON_WS(sentence)
+        ])
+        logger.info("[TTS] Streaming audio for %d characters...", len(text))
+
+        pool = ThreadPoolExecutor(max_workers=STREAM_CONCURRENCY)
+        pending = deque(
+            pool.submit(self._synthesize, sentence)
+            for sentence in islice(sentences, STREAM_CONCURRENCY)
+        )
 
+        try:
+            first = True
+            while pending:
+                data = pending.popleft().result()
+
+                # Mantiene la pipeline piena mentre il chiamante consuma
+                sentence = next(sentences, None)
+                if sentence is not None:
+                    pending.append(pool.submit(self._synthesize, sentence))
+
+                yield data if first else _strip_id3(data)
+                first = False
+        finally:
+            # Errore o consumer che smette di leggere: niente richieste inutili
+            pool.shutdown(wait=False, cancel_futures=True)
 
 
 if __name__ == "__main__":
@@ -10,17 +10,71 @@ IMPORTANTE per STUDENTI:
 - Telegram comprime foto: meglio ricevere come "documento"
 """
 
+import asyncio
 import base64
-from typing import Optional
+import hashlib
+from typing import List, Optional
 from io import BytesIO
 
+from cachetools import TTLCache
+from PIL import Image, ImageOps, UnidentifiedImageError
+
 from config import llm_config
 from prompts import prompts
 from src.utils.logger import get_logger
-from src.utils.shared_clients import get_openai_client
+from src.utils.shared_clients import get_async_openai_client
 
 logger = get_logger(__name__)
 
+# Lato lungo massimo inviato a Vision (oltre non migliora l'analisi, solo il payload)
+MAX_IMAGE_SIDE = 2048
+
+# Qualità JPEG per le immagini ricompresse
+JPEG_QUALITY = 85
+
+# Dimensione massima accettata da Vision (oltre: rifiutata senza chiamare l'API)
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+
+# Cache analisi Vision indicizzata sul contenuto dell'immagine
+# (stessa immagine inoltrata più volte = una sola chiamata API)
+VISION_CACHE_SIZE = 1024
+VISION_CACHE_TTL = 24 * 60 * 60  # secondi
+
+_vision_cache: TTLCache = TTLCache(maxsize=VISION_CACHE_SIZE, ttl=VISION_CACHE_TTL)
+
+
+# Prefisso data URL per immagini JPEG inviate a Vision
+_DATA_URL_PREFIX = b"data:image/jpeg;base64,"
+
+# Prompt fissi costruiti una volta sola: la stessa stringa a ogni chiamata
+# (anche nella chiave della cache Vision, con hash già calcolato)
+_DEFAULT_VISION_PROMPT = prompts.vision_analysis_prompt()
+
+_OCR_PROMPT = """Estrai TUTTO il testo visibile in questa immagine.
+
+Regole:
+- Mantieni formattazione originale quando possibile
+- Se tabella, preserva struttura
+- Se codice, preserva indentazione
+- Ignora elementi grafici/decorativi
+
+Restituisci SOLO il testo estratto, senza commenti aggiuntivi."""
+
+_ACCESSIBILITY_PROMPT = """Genera una descrizione accessibile di questa immagine per utenti non vedenti.
+
+Descrivi:
+- Contenuto principale
+- Layout e composizione
+- Testo importante
+- Contesto rilevante
+
+Sii conciso ma completo (max 2-3 frasi)."""
+
+
+def _image_digest(image_bytes: bytes) -> str:
+    """Hash del contenuto immagine (blake2b 128 bit, più veloce di sha256)."""
+    return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+
 
 class ImageProcessor:
     """
@@ -32,14 +86,24 @@ class ImageProcessor:
     3. Visual Q&A
     4. Context-aware processing
 
+    Tutte le chiamate Vision sono async (AsyncOpenAI): non bloccano
+    l'event loop del bot e sono limitate da un semaforo condiviso
+    (llm_config.MAX_CONCURRENCY).
+
     Example:
         >>> processor = ImageProcessor()
-        >>> description = processor.analyze_image(
+        >>> description = await processor.analyze_image(
         ...     image_bytes=image_data,
         ...     prompt="Describe this image in detail"
         ... )
     """
 
+    # Semaforo condiviso tra istanze, creato al primo uso dentro l'event loop
+    _semaphore: Optional[asyncio.Semaphore] = None
+
+    # Immagini scartate prima della chiamata Vision (vuote, troppo grandi, corrotte)
+    rejected_images: int = 0
+
     def __init__(self, model: Optional[str] = None):
         """
         Inizializza ImageProcessor.
@@ -52,25 +116,118 @@ class ImageProcessor:
         logger.info(f"[INIT] ImageProcessor")
         logger.info(f"       Model: {self.model}")
 
-        # Use shared OpenAI client (evita duplicazioni)
-        self.client = get_openai_client()
+        # Use shared AsyncOpenAI client (evita duplicazioni)
+        self.client = get_async_openai_client()
+
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        """Restituisce il semaforo che limita le chiamate Vision concorrenti."""
+        if cls._semaphore is None:
+            cls._semaphore = asyncio.Semaphore(llm_config.MAX_CONCURRENCY)
+        return cls._semaphore
+
+    def _prepare_image(self, image_bytes: bytes) -> bytes:
+        """
+        Ridimensiona e ricomprime l'immagine in JPEG prima dell'upload.
+
+        PNG/WebP o foto oltre MAX_IMAGE_SIDE vengono ridotte (lato lungo
+        MAX_IMAGE_SIDE) e salvate come JPEG (qualità JPEG_QUALITY): payload
+        e tempo di base64 calano di diverse volte. I JPEG già entro il
+        limite (es: foto Telegram) vengono inviati così come sono.
+
+        Args:
+            image_bytes: Raw bytes immagine
+
+        Returns:
+            Bytes JPEG (o i bytes originali se non decodificabili o già più piccoli)
+        """
+        try:
+            img = Image.open(BytesIO(image_bytes))
+
+            if img.format == "JPEG" and max(img.size) <= MAX_IMAGE_SIDE:
+                return image_bytes
+
+            # Il JPEG ricompresso perde l'EXIF: applica prima l'orientamento
+            # (foto da smartphone inviate come documento, altrimenti ruotate)
+            img = ImageOps.exif_transpose(img)
+
+            img.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE), Image.Resampling.LANCZOS)
+
+            # JPEG non ha trasparenza: componi su sfondo bianco
+            if img.mode in ("RGBA", "LA", "P"):
+                rgba = img.convert("RGBA")
+                img = Image.new("RGB", rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.getchannel("A"))
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+
+            buffer = BytesIO()
+            img.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True)
+            data = buffer.getvalue()
+
+            # Immagini piccole/semplici (es: PNG piatti) possono crescere: tieni l'originale
+            if len(data) >= len(image_bytes):
+                return image_bytes
+
+            logger.info(f"[VISION] Image recompressed: {len(image_bytes)} -> {len(data)} bytes")
+            return data
+
+        except (UnidentifiedImageError, OSError) as e:
+            logger.warning(f"[WARN] Could not recompress image, sending original: {e}")
+            return image_bytes
 
     def _encode_image(self, image_bytes: bytes) -> str:
         """
-        Encode immagine in base64 per OpenAI API.
+        Encode immagine come data URL base64 per OpenAI API.
+
+        L'immagine viene prima ridotta/ricompressa (_prepare_image). Prefisso e
+        base64 sono uniti in bytes e decodificati una sola volta in ASCII:
+        niente str base64 intermedia ricopiata in una f-string.
 
         Args:
             image_bytes: Raw bytes immagine
 
         Returns:
-            Base64 encoded string
+            Data URL "data:image/jpeg;base64,..."
 
         Example:
-            >>> encoded = processor._encode_image(image_data)
+            >>> url = processor._encode_image(image_data)
+        """
+        data_url = bytearray(_DATA_URL_PREFIX)
+        data_url += base64.b64encode(self._prepare_image(image_bytes))
+        return data_url.decode('ascii')
+
+    def _validate_image(self, image_bytes: bytes) -> bool:
+        """
+        Scarta immagini vuote, troppo grandi o corrotte prima della chiamata Vision.
+
+        Controlla la dimensione e verifica l'header con Pillow (verify() non
+        decodifica i pixel). Ogni immagine rifiutata incrementa rejected_images.
+
+        Args:
+            image_bytes: Raw bytes immagine
+
+        Returns:
+            True se l'immagine può essere inviata a Vision
         """
-        return base64.b64encode(image_bytes).decode('utf-8')
+        if not image_bytes:
+            logger.warning("[WARN] Empty image bytes")
+        elif len(image_bytes) > MAX_IMAGE_BYTES:
+            logger.warning(
+                f"[WARN] Image too large for Vision: {len(image_bytes)} bytes "
+                f"(max {MAX_IMAGE_BYTES})"
+            )
+        else:
+            try:
+                Image.open(BytesIO(image_bytes)).verify()
+                return True
+            except Exception as e:
+                logger.warning(f"[WARN] Invalid image ({len(image_bytes)} bytes): {e}")
 
-    def analyze_image(
+        ImageProcessor.rejected_images += 1
+        return False
+
+    async def analyze_image(
         self,
         image_bytes: bytes,
         prompt: Optional[str] = None,
@@ -88,61 +245,113 @@ class ImageProcessor:
             Descrizione/analisi immagine o None se errore
 
         Example:
-            >>> analysis = processor.analyze_image(
+            >>> analysis = await processor.analyze_image(
             ...     image_bytes=img_data,
             ...     prompt="What objects are in this image?"
             ... )
             >>> print(analysis)
         """
-        if not image_bytes:
-            logger.warning("[WARN] Empty image bytes")
+        # Input vuoti, oltre il limite o corrotti: nessuna chiamata API
+        if not self._validate_image(image_bytes):
             return None
 
-        # Default prompt se non specificato
+        # Default prompt se non specificato (centralizzato in prompts.py)
         if not prompt:
-            # Usa prompt centralizzato da prompts.py
-            prompt = prompts.VISION_ANALYSIS_PROMPT.format(caption="")
+            prompt = _DEFAULT_VISION_PROMPT
+
+        cache_key = (_image_digest(image_bytes), prompt, max_tokens, self.model)
+        cached = _vision_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"[VISION] Cache hit ({len(cached)} chars analysis)")
+            return cached
 
         logger.info(f"[VISION] Processing image ({len(image_bytes)} bytes)...")
 
         try:
-            # Encode image
-            base64_image = self._encode_image(image_bytes)
+            # Encode image (data URL completo): resize Pillow e base64 in un
+            # thread, per non bloccare l'event loop sulle immagini grandi
+            image_url = await asyncio.to_thread(self._encode_image, image_bytes)
 
             # Create message with image
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
+            async with self._get_semaphore():
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": prompt
+                                },
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": image_url
+                                    }
                                 }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=max_tokens
-            )
+                            ]
+                        }
+                    ],
+                    max_tokens=max_tokens
+                )
 
             # Extract response
             analysis = response.choices[0].message.content
 
             logger.info(f"[OK] Generated {len(analysis)} chars analysis")
+            if analysis:
+                _vision_cache[cache_key] = analysis
             return analysis
 
         except Exception as e:
             logger.error(f"[ERROR] Vision API failed: {e}")
             return None
 
-    def extract_text(self, image_bytes: bytes) -> Optional[str]:
+    def invalidate(self, image_bytes: bytes) -> int:
+        """
+        Rimuove dalla cache tutte le analisi di un'immagine (ogni prompt/modello).
+
+        Args:
+            image_bytes: Raw bytes immagine
+
+        Returns:
+            Numero di analisi rimosse
+        """
+        digest = _image_digest(image_bytes)
+        keys = [key for key in list(_vision_cache) if key[0] == digest]
+        for key in keys:
+            _vision_cache.pop(key, None)
+        return len(keys)
+
+    async def analyze_images(
+        self,
+        images: List[bytes],
+        prompt: Optional[str] = None,
+        max_tokens: int = 500
+    ) -> List[Optional[str]]:
+        """
+        Analizza più immagini in parallelo (asyncio.gather).
+
+        La concorrenza effettiva è limitata dal semaforo condiviso.
+
+        Args:
+            images: Lista di raw bytes immagini
+            prompt: Prompt custom (opzionale, usa default se None)
+            max_tokens: Max tokens risposta
+
+        Returns:
+            Lista analisi (stesso ordine di images), None per le immagini fallite
+
+        Example:
+            >>> analyses = await processor.analyze_images([img1, img2])
+        """
+        return await asyncio.gather(*(
+            self.analyze_image(image_bytes, prompt=prompt, max_tokens=max_tokens)
+            for image_bytes in images
+        ))
+
+    async def extract_text(self, image_bytes: bytes) -> Optional[str]:
         """
         Estrae testo da immagine (OCR).
 
@@ -155,26 +364,16 @@ class ImageProcessor:
             Testo estratto o None
 
         Example:
-            >>> text = processor.extract_text(screenshot_bytes)
+            >>> text = await processor.extract_text(screenshot_bytes)
             >>> print(f"Extracted: {text}")
         """
-        ocr_prompt = """Estrai TUTTO il testo visibile in questa immagine.
-
-Regole:
-- Mantieni formattazione originale quando possibile
-- Se tabella, preserva struttura
-- Se codice, preserva indentazione
-- Ignora elementi grafici/decorativi
-
-Restituisci SOLO il testo estratto, senza commenti aggiuntivi."""
-
-        return self.analyze_image(
+        return await self.analyze_image(
             image_bytes=image_bytes,
-            prompt=ocr_prompt,
+            prompt=_OCR_PROMPT,
             max_tokens=1000
         )
 
-    def answer_question(
+    async def answer_question(
         self,
         image_bytes: bytes,
         question: str,
@@ -192,21 +391,21 @@ Restituisci SOLO il testo estratto, senza commenti aggiuntivi."""
             Risposta o None
 
         Example:
-            >>> answer = processor.answer_question(
+            >>> answer = await processor.answer_question(
             ...     image_bytes=diagram_bytes,
             ...     question="Spiega questo diagramma"
             ... )
         """
         # Usa prompt centralizzato da prompts.py
-        qa_prompt = prompts.VISION_QUESTION_PROMPT.format(question=question)
+        qa_prompt = prompts.vision_question_prompt(question)
 
-        return self.analyze_image(
+        return await self.analyze_image(
             image_bytes=image_bytes,
             prompt=qa_prompt,
             max_tokens=max_tokens
         )
 
-    def describe_for_accessibility(self, image_bytes: bytes) -> Optional[str]:
+    async def describe_for_accessibility(self, image_bytes: bytes) -> Optional[str]:
         """
         Genera descrizione accessibile per screen readers.
 
@@ -217,21 +416,11 @@ Restituisci SOLO il testo estratto, senza commenti aggiuntivi."""
             Descrizione accessibile
 
         Example:
-            >>> alt_text = processor.describe_for_accessibility(img)
+            >>> alt_text = await processor.describe_for_accessibility(img)
         """
-        accessibility_prompt = """Genera una descrizione accessibile di questa immagine per utenti non vedenti.
-
-Descrivi:
-- Contenuto principale
-- Layout e composizione
-- Testo importante
-- Contesto rilevante
-
-Sii conciso ma completo (max 2-3 frasi)."""
-
-        return self.analyze_image(
+        return await self.analyze_image(
             image_bytes=image_bytes,
-            prompt=accessibility_prompt,
+            prompt=_ACCESSIBILITY_PROMPT,
             max_tokens=200
         )
 
@@ -250,7 +439,7 @@ if __name__ == "__main__":
         encoded = processor._encode_image(dummy_image)
         print(f"\n[TEST] Image encoding")
         print(f"       Input: {len(dummy_image)} bytes")
-        print(f"       Encoded: {len(encoded)} chars base64")
+        print(f"       Encoded: {len(encoded)} chars data URL")
 
         print("\n[INFO] Skipping actual Vision API call (requires API key + image)")
         print("       Set valid OPENAI_API_KEY and provide real image to test")
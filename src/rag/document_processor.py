@@ -9,12 +9,21 @@ Processa documenti (PDF, DOCX, TXT) per RAG:
 
 IMPORTANTE per STUDENTI:
 - Usa pypdf (NON PyPDF2 deprecato!)
-- Chunking con RecursiveCharacterTextSplitter
+- Chunking ricorsivo (stessa logica di RecursiveCharacterTextSplitter, vedi text_splitter.py)
 - Metadata include: source, page, chunk_index, timestamp
 """
 
+import asyncio
+import hashlib
+import mmap
 import os
-from typing import List, Dict, Optional, Tuple
+import shutil
+import tempfile
+import uuid
+from collections import deque
+from io import BytesIO, IOBase
+from itertools import islice
+from typing import BinaryIO, Iterator, List, Dict, Optional, Tuple, Union
 from pathlib import Path
 from datetime import datetime
 
@@ -22,21 +31,112 @@ from datetime import datetime
 import pypdf
 from docx import Document
 
-# LangChain text splitters
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from cachetools import LRUCache
 
-from config import rag_config, paths_config
+from config import llm_config, rag_config, paths_config
+from src.rag.pdf_worker import PDF_PROCESS_WORKERS, submit_page_range
+from src.rag.text_splitter import RecursiveTextSplitter
 from src.utils.logger import get_logger
-from src.utils.shared_clients import get_openai_client
+from src.utils.shared_clients import get_async_openai_client
 from src.utils.helpers import (
+    SUPPORTED_DOCUMENT_EXTENSIONS,
     extract_file_extension,
-    is_supported_document,
-    sanitize_filename,
-    generate_doc_id
+    document_file_path,
+    generate_doc_id,
+    truncate_text
 )
 
 logger = get_logger(__name__)
 
+# Token del documento inviati al LLM per generare il sommario
+SUMMARY_MAX_INPUT_TOKENS = 1500
+
+# Sommari già generati, per (hash contenuto, filename): un ri-upload non richiama il LLM
+_summary_cache: LRUCache = LRUCache(maxsize=256)
+
+# Caratteri iniziali del PDF letti prima di generare il sommario (~10 per token)
+SUMMARY_PREVIEW_CHARS = SUMMARY_MAX_INPUT_TOKENS * 10
+
+# PDF con almeno queste pagine vengono estratti in parallelo
+PDF_PARALLEL_MIN_PAGES = 32
+
+# Pagine estratte per task del pool di processi (src/rag/pdf_worker.py)
+PDF_PAGE_BATCH = 16
+
+# Chunks inviati al vector store per ogni add_document durante lo streaming
+VECTOR_BATCH_SIZE = 128
+
+
+# Sorgente documento: path su disco o file-like binario in memoria (es: BytesIO)
+DocumentSource = Union[str, BinaryIO]
+
+
+def _read_bytes(source: DocumentSource) -> bytes:
+    """Contenuto completo della sorgente (path o file-like)."""
+    if isinstance(source, IOBase):
+        if isinstance(source, BytesIO):
+            return source.getvalue()
+        source.seek(0)
+        return source.read()
+
+    with open(source, 'rb') as file:
+        return file.read()
+
+
+def _content_hash(source: DocumentSource) -> str:
+    """
+    Hash BLAKE2b (128 bit) del contenuto: identifica upload identici.
+
+    BytesIO viene hashato senza copie (getbuffer), i file a blocchi.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    if isinstance(source, BytesIO):
+        hasher.update(source.getbuffer())
+    else:
+        with open(source, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _decode_text(data) -> str:
+    """
+    Decodifica testo UTF-8 (fallback latin-1) con newline universali.
+
+    data può essere bytes o un buffer (memoryview, mmap): nessuna copia prima
+    della decodifica. Stesso risultato di open(..., 'r'): \r\n e \r diventano \n.
+    """
+    try:
+        text = str(data, 'utf-8')
+    except UnicodeDecodeError:
+        # Fallback a latin-1 se UTF-8 fallisce
+        logger.warning("[WARN] UTF-8 failed, trying latin-1")
+        text = str(data, 'latin-1')
+
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _load_text(source: DocumentSource) -> str:
+    """
+    Testo di un file TXT/MD senza copiarne i bytes in memoria.
+
+    BytesIO viene decodificato dal suo buffer (getbuffer), i file su disco
+    da una mappatura mmap in sola lettura.
+    """
+    if isinstance(source, BytesIO):
+        return _decode_text(source.getbuffer())
+    if isinstance(source, IOBase):
+        return _decode_text(_read_bytes(source))
+
+    with open(source, 'rb') as file:
+        # mmap non accetta file vuoti
+        if os.fstat(file.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return _decode_text(mapped)
+
 
 class DocumentProcessor:
     """
@@ -51,7 +151,7 @@ class DocumentProcessor:
 
     Example:
         >>> processor = DocumentProcessor()
-        >>> doc_id, num_chunks = processor.process_and_add(
+        >>> doc_id, num_chunks, summary = await processor.process_and_add_async(
         ...     filepath="document.pdf",
         ...     filename="document.pdf",
         ...     vector_store=vs
@@ -59,6 +159,9 @@ class DocumentProcessor:
         >>> print(f"Processed {num_chunks} chunks")
     """
 
+    # Semaforo condiviso per le chiamate LLM, creato al primo uso dentro l'event loop
+    _semaphore: Optional[asyncio.Semaphore] = None
+
     def __init__(
         self,
         chunk_size: Optional[int] = None,
@@ -81,17 +184,17 @@ class DocumentProcessor:
         # ========================================
         # Setup Text Splitter
         # ========================================
-        # RecursiveCharacterTextSplitter cerca di splittare su:
+        # Lo splitter ricorsivo cerca di splittare su:
         # 1. Paragrafi (\n\n)
         # 2. Righe singole (\n)
         # 3. Frasi (. )
         # 4. Parole ( )
         # 5. Caratteri singoli
         # In quest'ordine, mantenendo contesto semantico!
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        # Stessi chunk di RecursiveCharacterTextSplitter (LangChain), ma più veloce
+        self.text_splitter = RecursiveTextSplitter(
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
-            length_function=len,
             separators=["\n\n", "\n", ". ", " ", ""]
         )
         logger.info("[OK] Text splitter configured")
@@ -99,10 +202,17 @@ class DocumentProcessor:
         # ========================================
         # Setup OpenAI client for summary generation
         # ========================================
-        # Use shared OpenAI client (evita duplicazioni)
-        self.openai_client = get_openai_client()
+        # Use shared AsyncOpenAI client (evita duplicazioni)
+        self.openai_client = get_async_openai_client()
+
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        """Restituisce il semaforo che limita le chiamate LLM concorrenti."""
+        if cls._semaphore is None:
+            cls._semaphore = asyncio.Semaphore(llm_config.MAX_CONCURRENCY)
+        return cls._semaphore
 
-    def generate_summary(self, text: str, filename: str) -> str:
+    async def generate_summary(self, text: str, filename: str) -> str:
         """
         Genera sommario breve del documento usando LLM.
 
@@ -117,15 +227,26 @@ class DocumentProcessor:
             Sommario breve (1-2 frasi, max 100 parole)
 
         Example:
-            >>> summary = processor.generate_summary(text, "python_guide.pdf")
+            >>> summary = await processor.generate_summary(text, "python_guide.pdf")
             >>> print(summary)
             "Guida Python - variabili, loop, funzioni, OOP"
         """
+        cache_key = (hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest(), filename)
+        cached = _summary_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"[SUMMARY] Cache hit for {filename}")
+            return cached
+
         logger.info(f"[SUMMARY] Generating summary for {filename}...")
 
         try:
-            # Tronca testo se troppo lungo (max 4000 chars per efficienza)
-            text_preview = text[:4000] if len(text) > 4000 else text
+            # Tronca testo a un budget di token (esatto, non stimato sui caratteri)
+            text_preview = truncate_text(
+                text,
+                max_tokens=SUMMARY_MAX_INPUT_TOKENS,
+                model="gpt-4o-mini",
+                suffix=""
+            )
 
             prompt = f"""Genera un sommario MOLTO breve (max 100 parole) di questo documento.
 Il sommario deve essere conciso e descrivere i temi principali trattati.
@@ -136,19 +257,22 @@ Testo:
 
 Sommario (1-2 frasi max):"""
 
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",  # Modello veloce ed economico
-                messages=[
-                    {"role": "system", "content": "Sei un assistente che genera sommari concisi di documenti."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=100,
-                temperature=0.3  # Deterministico
-            )
+            async with self._get_semaphore():
+                response = await self.openai_client.chat.completions.create(
+                    model="gpt-4o-mini",  # Modello veloce ed economico
+                    messages=[
+                        {"role": "system", "content": "Sei un assistente che genera sommari concisi di documenti."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=100,
+                    temperature=0.3  # Deterministico
+                )
 
             summary = response.choices[0].message.content.strip()
             logger.info(f"[OK] Summary: '{summary[:80]}...'")
 
+            _summary_cache[cache_key] = summary
+
             return summary
 
         except Exception as e:
@@ -157,7 +281,102 @@ Sommario (1-2 frasi max):"""
             fallback = text[:200].replace("\n", " ").strip()
             return f"{filename} - {fallback}..."
 
-    def load_pdf(self, filepath: str) -> Tuple[str, List[int]]:
+    async def generate_summaries(
+        self,
+        documents: List[Tuple[str, str]]
+    ) -> List[str]:
+        """
+        Genera i sommari di più documenti in parallelo (asyncio.gather).
+
+        Args:
+            documents: Lista di tuple (testo, filename)
+
+        Returns:
+            Lista sommari, nello stesso ordine di documents
+
+        Example:
+            >>> summaries = await processor.generate_summaries([(text1, "a.pdf"), (text2, "b.md")])
+        """
+        return await asyncio.gather(*(
+            self.generate_summary(text, filename)
+            for text, filename in documents
+        ))
+
+    def iter_pdf_pages(self, filepath: DocumentSource) -> Iterator[Tuple[int, str]]:
+        """
+        Estrae le pagine di un PDF una alla volta, in ordine.
+
+        PDF grandi: batch di PDF_PAGE_BATCH pagine estratti in parallelo in
+        processi separati (pypdf è Python puro: i thread non scalano per via
+        del GIL), con al massimo PDF_PROCESS_WORKERS batch in anticipo
+        rispetto al consumer (il testo completo non è mai in memoria tutto
+        insieme). I worker leggono il PDF da disco: un file in memoria viene
+        scritto una volta in un file temporaneo, rimosso a fine estrazione.
+
+        Args:
+            filepath: Path al file PDF (o file-like binario)
+
+        Yields:
+            Tuple (numero pagina 1-indexed, testo) per le pagine con testo
+        """
+        pdf_bytes = _read_bytes(filepath)
+
+        pdf_reader = pypdf.PdfReader(BytesIO(pdf_bytes))
+        num_pages = len(pdf_reader.pages)
+
+        logger.info(f"      PDF has {num_pages} pages")
+
+        if num_pages < PDF_PARALLEL_MIN_PAGES or PDF_PROCESS_WORKERS == 1:
+            for page_num, page in enumerate(pdf_reader.pages, 1):
+                page_text = page.extract_text()
+                if page_text:
+                    yield page_num, page_text
+            return
+
+        # Path leggibile dai worker (i bytes non vengono inviati a ogni task)
+        if isinstance(filepath, str):
+            pdf_path, temp_path = filepath, None
+        else:
+            fd, temp_path = tempfile.mkstemp(suffix=".pdf")
+            with os.fdopen(fd, 'wb') as file:
+                file.write(pdf_bytes)
+            pdf_path = temp_path
+
+        starts = iter(range(0, num_pages, PDF_PAGE_BATCH))
+        token = uuid.uuid4().hex
+
+        def submit(start: int):
+            stop = min(start + PDF_PAGE_BATCH, num_pages)
+            return start, submit_page_range(pdf_path, token, start, stop)
+
+        pending = deque()
+
+        try:
+            pending.extend(submit(start) for start in islice(starts, PDF_PROCESS_WORKERS))
+
+            while pending:
+                start, future = pending.popleft()
+                page_texts = future.result()
+
+                # Mantiene la pipeline piena mentre il consumer processa
+                next_start = next(starts, None)
+                if next_start is not None:
+                    pending.append(submit(next_start))
+
+                for offset, page_text in enumerate(page_texts, 1):
+                    if page_text:
+                        yield start + offset, page_text
+        finally:
+            # Errore o consumer che si ferma: niente estrazioni inutili
+            for _, future in pending:
+                future.cancel()
+            if temp_path:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+
+    def load_pdf(self, filepath: DocumentSource) -> Tuple[str, List[int]]:
         """
         Carica PDF e estrae testo.
 
@@ -179,22 +398,14 @@ Sommario (1-2 frasi max):"""
         logger.info(f"[PDF] Loading: {filepath}")
 
         try:
-            text_content = ""
+            # Pagine unite una sola volta (niente += in loop, O(n) invece di O(n²))
+            parts = []
             page_numbers = []
+            for page_num, page_text in self.iter_pdf_pages(filepath):
+                parts.append(page_text)
+                page_numbers.append(page_num)
 
-            with open(filepath, 'rb') as file:
-                pdf_reader = pypdf.PdfReader(file)
-                num_pages = len(pdf_reader.pages)
-
-                logger.info(f"      PDF has {num_pages} pages")
-
-                for page_num in range(num_pages):
-                    page = pdf_reader.pages[page_num]
-                    page_text = page.extract_text()
-
-                    if page_text:
-                        text_content += page_text + "\n\n"
-                        page_numbers.append(page_num + 1)  # 1-indexed
+            text_content = "\n\n".join(parts) + "\n\n" if parts else ""
 
             logger.info(f"[OK] Extracted {len(text_content)} characters")
             return text_content, page_numbers
@@ -203,7 +414,7 @@ Sommario (1-2 frasi max):"""
             logger.error(f"[ERROR] Failed to load PDF: {e}")
             raise
 
-    def load_docx(self, filepath: str) -> str:
+    def load_docx(self, filepath: DocumentSource) -> str:
         """
         Carica DOCX e estrae testo.
 
@@ -224,13 +435,13 @@ Sommario (1-2 frasi max):"""
         logger.info(f"[DOCX] Loading: {filepath}")
 
         try:
+            if isinstance(filepath, IOBase):
+                filepath.seek(0)
             doc = Document(filepath)
-            text_content = ""
 
-            # Estrai testo da tutti i paragrafi
-            for para in doc.paragraphs:
-                if para.text.strip():
-                    text_content += para.text + "\n\n"
+            # Estrai testo da tutti i paragrafi (unito una sola volta)
+            parts = [text for text in (para.text for para in doc.paragraphs) if text.strip()]
+            text_content = "\n\n".join(parts) + "\n\n" if parts else ""
 
             logger.info(f"[OK] Extracted {len(text_content)} characters")
             return text_content
@@ -239,7 +450,7 @@ Sommario (1-2 frasi max):"""
             logger.error(f"[ERROR] Failed to load DOCX: {e}")
             raise
 
-    def load_txt(self, filepath: str) -> str:
+    def load_txt(self, filepath: DocumentSource) -> str:
         """
         Carica TXT e legge contenuto.
 
@@ -258,24 +469,16 @@ Sommario (1-2 frasi max):"""
         logger.info(f"[TXT] Loading: {filepath}")
 
         try:
-            with open(filepath, 'r', encoding='utf-8') as file:
-                text_content = file.read()
+            text_content = _load_text(filepath)
 
             logger.info(f"[OK] Extracted {len(text_content)} characters")
             return text_content
 
-        except UnicodeDecodeError:
-            # Fallback a latin-1 se UTF-8 fallisce
-            logger.warning("[WARN] UTF-8 failed, trying latin-1")
-            with open(filepath, 'r', encoding='latin-1') as file:
-                text_content = file.read()
-            return text_content
-
         except Exception as e:
             logger.error(f"[ERROR] Failed to load TXT: {e}")
             raise
 
-    def load_md(self, filepath: str) -> str:
+    def load_md(self, filepath: DocumentSource) -> str:
         """
         Carica Markdown (.md) e legge contenuto.
 
@@ -297,29 +500,21 @@ Sommario (1-2 frasi max):"""
         logger.info(f"[MD] Loading: {filepath}")
 
         try:
-            with open(filepath, 'r', encoding='utf-8') as file:
-                text_content = file.read()
+            text_content = _load_text(filepath)
 
             logger.info(f"[OK] Extracted {len(text_content)} characters")
             return text_content
 
-        except UnicodeDecodeError:
-            # Fallback a latin-1 se UTF-8 fallisce
-            logger.warning("[WARN] UTF-8 failed, trying latin-1")
-            with open(filepath, 'r', encoding='latin-1') as file:
-                text_content = file.read()
-            return text_content
-
         except Exception as e:
             logger.error(f"[ERROR] Failed to load MD: {e}")
             raise
 
-    def load_document(self, filepath: str, file_type: str) -> Tuple[str, Optional[List[int]]]:
+    def load_document(self, filepath: DocumentSource, file_type: str) -> Tuple[str, Optional[List[int]]]:
         """
         Router per caricare documento in base al tipo.
 
         Args:
-            filepath: Path al file
+            filepath: Path al file (o file-like binario, es: BytesIO)
             file_type: Estensione file (pdf, docx, txt, md)
 
         Returns:
@@ -349,7 +544,7 @@ Sommario (1-2 frasi max):"""
 
     def chunk_text(self, text: str) -> List[str]:
         """
-        Splitta testo in chunks usando RecursiveCharacterTextSplitter.
+        Splitta testo in chunks usando RecursiveTextSplitter.
 
         Args:
             text: Testo da splittare
@@ -383,7 +578,8 @@ Sommario (1-2 frasi max):"""
         filename: str,
         doc_id: str,
         chunk_index: int,
-        page: Optional[int] = None
+        page: Optional[int] = None,
+        timestamp: Optional[str] = None
     ) -> Dict:
         """
         Crea metadata dict per chunk.
@@ -400,6 +596,8 @@ Sommario (1-2 frasi max):"""
             doc_id: ID documento
             chunk_index: Indice chunk
             page: Numero pagina (opzionale)
+            timestamp: Timestamp ISO (default: now). Passarlo calcolato una
+                volta per documento evita una datetime.now() per chunk.
 
         Returns:
             Dict metadata
@@ -416,7 +614,7 @@ Sommario (1-2 frasi max):"""
             "source": filename,
             "doc_id": doc_id,
             "chunk_index": chunk_index,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": timestamp or datetime.now().isoformat()
         }
 
         if page is not None:
@@ -424,28 +622,248 @@ Sommario (1-2 frasi max):"""
 
         return metadata
 
-    def process_and_add(
+    def _build_metadata(
+        self,
+        filename: str,
+        doc_id: str,
+        chunk_index: int,
+        summary: str,
+        timestamp: str,
+        page: Optional[int] = None,
+        content_hash: Optional[str] = None
+    ) -> Dict:
+        """Metadata chunk con sommario documento (incluso in ogni chunk)."""
+        metadata = self.create_metadata(
+            filename=filename,
+            doc_id=doc_id,
+            chunk_index=chunk_index,
+            page=page,
+            timestamp=timestamp
+        )
+        metadata["summary"] = summary
+        if content_hash:
+            metadata["content_hash"] = content_hash
+        return metadata
+
+    async def _add_text_document(
+        self,
+        filepath: DocumentSource,
+        filename: str,
+        file_type: str,
+        doc_id: str,
+        vector_store,
+        content_hash: Optional[str] = None
+    ) -> Tuple[int, str]:
+        """
+        Load → chunk → sommario → vector store per documenti non paginati (DOCX/TXT/MD).
+
+        Parsing e chunking (CPU) girano in un thread: l'event loop continua
+        a servire gli altri utenti.
+
+        Returns:
+            Tuple (numero chunks aggiunti, sommario)
+        """
+        text, _ = await asyncio.to_thread(self.load_document, filepath, file_type)
+
+        if not text or len(text.strip()) == 0:
+            raise ValueError(f"Document is empty or could not be read: {filename}")
+
+        chunks = await asyncio.to_thread(self.chunk_text, text)
+
+        if not chunks:
+            raise ValueError(f"No chunks created from document: {filename}")
+
+        # Sommario (per system prompt) ed embeddings sono indipendenti: in parallelo
+        logger.info(f"[VECTORDB] Embedding {len(chunks)} chunks (summary in parallel)...")
+        summary, embeddings = await asyncio.gather(
+            self.generate_summary(text, filename),
+            vector_store.embed_documents_async(chunks)
+        )
+
+        timestamp = datetime.now().isoformat()
+        metadatas = [
+            self._build_metadata(filename, doc_id, i, summary, timestamp, content_hash=content_hash)
+            for i in range(len(chunks))
+        ]
+
+        logger.info(f"[VECTORDB] Adding {len(chunks)} chunks...")
+        num_added = await vector_store.add_document_batched(
+            chunks=chunks,
+            metadatas=metadatas,
+            doc_id=doc_id,
+            embeddings=embeddings
+        )
+
+        return num_added, summary
+
+    async def _add_pdf_streaming(
         self,
-        filepath: str,
+        filepath: DocumentSource,
         filename: str,
-        vector_store
+        doc_id: str,
+        vector_store,
+        content_hash: Optional[str] = None
+    ) -> Tuple[int, str]:
+        """
+        Ingestion PDF in streaming: pagina → chunk → batch nel vector store.
+
+        Il sommario usa solo le prime pagine (SUMMARY_PREVIEW_CHARS) e viene
+        generato in background mentre le pagine vengono chunkate ed embeddate;
+        i chunks sono aggiunti ogni VECTOR_BATCH_SIZE (il primo batch attende
+        il sommario): il testo completo non è mai in memoria. I chunk non
+        attraversano le pagine, quindi il numero di pagina è esatto.
+        Se l'ingestion fallisce a metà, i chunks già aggiunti vengono rimossi.
+
+        Returns:
+            Tuple (numero chunks aggiunti, sommario)
+        """
+        logger.info(f"[PDF] Streaming: {filename}")
+        pages = self.iter_pdf_pages(filepath)
+
+        # Estrazione testo (e chunking) delle pagine in un thread, una pagina
+        # alla volta: l'event loop resta libero per gli altri utenti
+        def next_page() -> Optional[Tuple[int, str]]:
+            return next(pages, None)
+
+        def next_chunked_page() -> Optional[Tuple[int, List[str]]]:
+            page = next(pages, None)
+            if page is None:
+                return None
+            return page[0], self.text_splitter.split_text(page[1])
+
+        # Prime pagine: bastano per il sommario
+        head = []
+        head_chars = 0
+        while head_chars < SUMMARY_PREVIEW_CHARS:
+            page = await asyncio.to_thread(next_page)
+            if page is None:
+                break
+            head.append(page)
+            head_chars += len(page[1])
+
+        if not any(page_text.strip() for _, page_text in head):
+            raise ValueError(f"Document is empty or could not be read: {filename}")
+
+        summary_task = asyncio.create_task(self.generate_summary(
+            "\n\n".join(page_text for _, page_text in head),
+            filename
+        ))
+
+        chunks: List[str] = []
+        chunk_pages: List[int] = []
+        num_added = 0
+        timestamp = datetime.now().isoformat()
+
+        async def flush() -> int:
+            logger.info(f"[VECTORDB] Adding {len(chunks)} chunks (from #{num_added})...")
+            embeddings = await vector_store.embed_documents_async(chunks)
+            summary = await summary_task
+            metadatas = [
+                self._build_metadata(
+                    filename, doc_id, num_added + i, summary, timestamp,
+                    page=page_num, content_hash=content_hash
+                )
+                for i, page_num in enumerate(chunk_pages)
+            ]
+            added = await vector_store.add_document_batched(
+                chunks=chunks,
+                metadatas=metadatas,
+                doc_id=doc_id,
+                embeddings=embeddings,
+                start_index=num_added
+            )
+            chunks.clear()
+            chunk_pages.clear()
+            return added
+
+        try:
+            head_pages = [
+                (page_num, self.text_splitter.split_text(page_text))
+                for page_num, page_text in head
+            ]
+            chunked_pages = iter(head_pages)
+
+            while True:
+                page = next(chunked_pages, None) or await asyncio.to_thread(next_chunked_page)
+                if page is None:
+                    break
+
+                page_num, page_chunks = page
+                chunks.extend(page_chunks)
+                chunk_pages.extend([page_num] * len(page_chunks))
+
+                if len(chunks) >= VECTOR_BATCH_SIZE:
+                    num_added += await flush()
+
+            if chunks:
+                num_added += await flush()
+
+        except BaseException:
+            try:
+                pages.close()  # Ferma l'estrazione delle pagine restanti
+            except ValueError:
+                pass  # Generator ancora in esecuzione nel thread (cancellazione)
+            summary_task.cancel()
+            if num_added:
+                logger.warning(f"[PDF] Ingestion failed, removing {num_added} partial chunks")
+                await vector_store.delete_document_async(doc_id)
+            raise
+
+        summary = await summary_task
+
+        if not num_added:
+            raise ValueError(f"No chunks created from document: {filename}")
+
+        logger.info(f"[OK] Streamed {num_added} chunks")
+        return num_added, summary
+
+    @staticmethod
+    def _copy_file(source: DocumentSource, dest_path: str) -> bool:
+        """Salva il file originale in documents directory (non blocca se fallisce)."""
+        try:
+            if isinstance(source, BytesIO):
+                # getbuffer: nessuna copia, posizione dello stream invariata
+                with open(dest_path, 'wb') as file:
+                    file.write(source.getbuffer())
+            else:
+                try:
+                    # Stesso filesystem: hardlink istantaneo, nessun byte copiato
+                    os.link(source, dest_path)
+                except OSError:
+                    # Filesystem diversi (o link non supportati): copy2 usa già
+                    # os.sendfile su Linux (copia nel kernel)
+                    shutil.copy2(source, dest_path)
+            logger.info(f"[COPY] Saved to: {dest_path}")
+            return True
+
+        except Exception as e:
+            logger.warning(f"[WARN] Could not copy file: {e}")
+            return False
+
+    async def process_and_add_async(
+        self,
+        filepath: Optional[str],
+        filename: str,
+        vector_store,
+        fileobj: Optional[BinaryIO] = None
     ) -> Tuple[str, int, str]:
         """
         Pipeline completo: load → chunk → summary → metadata → add to vector store.
 
         Steps:
-        1. Valida file supportato
-        2. Carica e estrae testo
-        3. Chunking
-        4. Genera sommario documento (LLM)
-        5. Genera metadata per ogni chunk
-        6. Aggiunge a vector store
-        7. Copia file in documents directory
+        1. Valida file supportato (e salta upload già indicizzati: stesso hash contenuto)
+        2. Salva file in documents directory (in background)
+        3. Carica e estrae testo
+        4. Chunking
+        5. Sommario documento (LLM) ed embeddings, in parallelo
+        6. Genera metadata per ogni chunk
+        7. Aggiunge a vector store
 
         Args:
-            filepath: Path completo al file
+            filepath: Path completo al file (None se si passa fileobj)
             filename: Nome file (per display)
             vector_store: VectorStoreManager instance
+            fileobj: Contenuto file in memoria (es: download Telegram), al posto di filepath
 
         Returns:
             Tuple (doc_id, numero chunks aggiunti, sommario documento)
@@ -458,7 +876,7 @@ Sommario (1-2 frasi max):"""
             >>> from src.rag.vector_store import VectorStoreManager
             >>> vs = VectorStoreManager()
             >>> processor = DocumentProcessor()
-            >>> doc_id, num_chunks = processor.process_and_add(
+            >>> doc_id, num_chunks, summary = await processor.process_and_add_async(
             ...     filepath="/tmp/document.pdf",
             ...     filename="document.pdf",
             ...     vector_store=vs
@@ -466,91 +884,65 @@ Sommario (1-2 frasi max):"""
         """
         logger.info(f"[PROCESS] Starting pipeline for: {filename}")
 
+        # Sorgente: file in memoria (BytesIO, letto senza spostare la posizione
+        # anche dal thread di salvataggio) oppure path su disco
+        if fileobj is not None:
+            source = fileobj if isinstance(fileobj, BytesIO) else BytesIO(fileobj.read())
+        elif filepath is not None:
+            source = filepath
+        else:
+            raise ValueError("filepath or fileobj is required")
+
         # ========================================
         # Step 1: Validazione
         # ========================================
-        if not is_supported_document(filename):
-            raise ValueError(f"Unsupported document type: {filename}")
-
         file_type = extract_file_extension(filename)
+        if file_type not in SUPPORTED_DOCUMENT_EXTENSIONS:
+            raise ValueError(f"Unsupported document type: {filename}")
 
-        # ========================================
-        # Step 2: Load documento
-        # ========================================
-        text, pages = self.load_document(filepath, file_type)
-
-        if not text or len(text.strip()) == 0:
-            raise ValueError(f"Document is empty or could not be read: {filename}")
-
-        # ========================================
-        # Step 3: Chunking
-        # ========================================
-        chunks = self.chunk_text(text)
-
-        if not chunks:
-            raise ValueError(f"No chunks created from document: {filename}")
+        # Stesso contenuto già indicizzato: niente parsing, sommario ed embeddings
+        content_hash = await asyncio.to_thread(_content_hash, source)
+        existing = await asyncio.to_thread(vector_store.find_document_by_hash, content_hash)
+        if existing:
+            logger.info(f"[DEDUP] {filename} already indexed as {existing['doc_id']}")
+            return existing['doc_id'], existing['num_chunks'], existing['summary']
 
-        # ========================================
-        # Step 4: Genera doc_id e sommario
-        # ========================================
         doc_id = generate_doc_id(filename)
         logger.info(f"[ID] Generated doc_id: {doc_id}")
 
-        # Genera sommario documento (per system prompt)
-        summary = self.generate_summary(text, filename)
-
-        # ========================================
-        # Step 5: Genera metadata per chunks
         # ========================================
-        metadatas = []
-        for i, chunk in enumerate(chunks):
-            # Stima pagina per chunk (se disponibile)
-            page_num = None
-            if pages:
-                # Stima approssimativa: chunk_index / num_chunks * num_pages
-                estimated_page_idx = int((i / len(chunks)) * len(pages))
-                if estimated_page_idx < len(pages):
-                    page_num = pages[estimated_page_idx]
-
-            metadata = self.create_metadata(
-                filename=filename,
-                doc_id=doc_id,
-                chunk_index=i,
-                page=page_num
-            )
-            # Aggiungi sommario ai metadata (per ogni chunk)
-            metadata["summary"] = summary
-            metadatas.append(metadata)
-
+        # Step 2: Salva file in documents directory (background)
         # ========================================
-        # Step 5: Add to vector store
-        # ========================================
-        logger.info(f"[VECTORDB] Adding {len(chunks)} chunks...")
-        num_added = vector_store.add_document(
-            chunks=chunks,
-            metadatas=metadatas,
-            doc_id=doc_id
+        # Serve solo il file originale: il salvataggio procede mentre si processa
+        dest_path = document_file_path(paths_config.DOCUMENTS_DIR, doc_id, filename)
+        copy_task = asyncio.create_task(
+            asyncio.to_thread(self._copy_file, source, dest_path)
         )
 
         # ========================================
-        # Step 6: Copia file in documents directory
+        # Step 3-7: Load → chunk → sommario + embeddings → vector store
         # ========================================
         try:
-            # Sanitize filename
-            safe_filename = sanitize_filename(filename)
-            dest_path = os.path.join(
-                paths_config.DOCUMENTS_DIR,
-                f"{doc_id}_{safe_filename}"
-            )
-
-            # Copia file
-            import shutil
-            shutil.copy2(filepath, dest_path)
-            logger.info(f"[COPY] Saved to: {dest_path}")
+            if file_type == "pdf":
+                # PDF: pagine in streaming, chunk aggiunti a batch
+                num_added, summary = await self._add_pdf_streaming(
+                    source, filename, doc_id, vector_store, content_hash=content_hash
+                )
+            else:
+                num_added, summary = await self._add_text_document(
+                    source, filename, file_type, doc_id, vector_store, content_hash=content_hash
+                )
+
+        except BaseException:
+            # Documento non indicizzato: niente copia orfana in documents directory
+            if await copy_task:
+                try:
+                    os.unlink(dest_path)
+                except OSError:
+                    pass
+            raise
 
-        except Exception as e:
-            logger.warning(f"[WARN] Could not copy file: {e}")
-            # Non bloccare se copia fallisce
+        await copy_task
 
         logger.info(f"[SUCCESS] Processed document")
         logger.info(f"          Doc ID: {doc_id}")
@@ -0,0 +1,83 @@
+"""
+PDF Worker Module
+
+Estrazione testo PDF in processi separati.
+
+pypdf è Python puro: con un thread pool le pagine vengono comunque estratte
+una alla volta (GIL). Con un pool di processi i batch di pagine girano
+davvero in parallelo su più core.
+
+Il modulo importa solo pypdf: i worker partono da un fork server che lo ha
+già caricato (pre-warm), senza LangChain, ChromaDB o il client OpenAI.
+
+STUDENTI: Il pool viene creato al primo PDF grande e riusato per tutti i
+documenti successivi (avviare processi costa: niente pool per documento).
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import pypdf
+
+# Processi per l'estrazione PDF (un core resta libero per l'event loop del bot)
+PDF_PROCESS_WORKERS = max(1, min(8, (os.cpu_count() or 1) - 1))
+
+# PdfReader del processo worker, riusato tra i batch dello stesso documento
+_reader: Optional[Tuple[str, pypdf.PdfReader]] = None
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def extract_page_range(path: str, token: str, start: int, stop: int) -> List[str]:
+    """
+    Estrae il testo delle pagine [start, stop) del PDF in path (nel worker).
+
+    Args:
+        path: Path del file PDF
+        token: Identificativo del documento (invalida il PdfReader in cache)
+        start: Prima pagina (0-indexed, inclusa)
+        stop: Ultima pagina (esclusa)
+
+    Returns:
+        Testo di ogni pagina ("" se la pagina non ha testo)
+    """
+    global _reader
+    if _reader is None or _reader[0] != token:
+        _reader = (token, pypdf.PdfReader(path))
+
+    reader = _reader[1]
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Pool di processi condiviso, creato al primo utilizzo."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                # Fork server con solo questo modulo precaricato: worker
+                # leggeri e pronti, nessun fork del processo del bot (thread attivi)
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload([__name__])
+            else:
+                context = multiprocessing.get_context("spawn")
+
+            _executor = ProcessPoolExecutor(
+                max_workers=PDF_PROCESS_WORKERS,
+                mp_context=context
+            )
+        return _executor
+
+
+def submit_page_range(path: str, token: str, start: int, stop: int) -> Future:
+    """
+    Accoda l'estrazione delle pagine [start, stop) nel pool di processi.
+
+    Returns:
+        Future con la lista dei testi di pagina
+    """
+    return _get_executor().submit(extract_page_range, path, token, start, stop)
@@ -5,12 +5,40 @@ Wrapper per query sul vector store con logica RAG avanzata.
 Include filtering, re-ranking, e formatting dei risultati.
 """
 
-from typing import List, Dict, Optional, Any
+import asyncio
+import json
+import threading
+from typing import List, Dict, Optional, Any, Hashable
+
+import numpy as np
+from cachetools import TTLCache
+
 from config import rag_config
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# SimSIMD opzionale (pip install simsimd): kernel SIMD per le similarità del rerank,
+# altrimenti NumPy
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
+
+def _cosine_similarities(queries: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """
+    Matrice similarità coseno (len(queries) x len(vectors)).
+
+    Usa SimSIMD se installato, altrimenti NumPy (righe normalizzate + matmul).
+    """
+    if simsimd is not None:
+        return 1.0 - np.asarray(simsimd.cdist(queries, vectors, metric="cosine"))
+
+    queries = queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12)
+    vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+    return queries @ vectors.T
+
 
 class Retriever:
     """
@@ -21,6 +49,8 @@ class Retriever:
     2. Filtering per metadata
     3. Formatting risultati con citazioni
     4. Score threshold filtering
+    5. Cache risultati per query ripetute (TTL, invalidata a ogni modifica documenti)
+    6. Rerank MMR opzionale (rilevanza + diversità tra chunks)
 
     Example:
         >>> retriever = Retriever(vector_store)
@@ -40,6 +70,13 @@ class Retriever:
         self.top_k = rag_config.TOP_K
         self.similarity_threshold = rag_config.SIMILARITY_THRESHOLD
 
+        # Cache (versione vector store, query, k, filtro, min_score) → risultati
+        self._cache: TTLCache = TTLCache(
+            maxsize=rag_config.QUERY_CACHE_SIZE,
+            ttl=rag_config.QUERY_CACHE_TTL
+        )
+        self._cache_lock = threading.RLock()
+
         logger.info(f"[INIT] Retriever")
         logger.info(f"       Top-K: {self.top_k}")
         logger.info(f"       Threshold: {self.similarity_threshold}")
@@ -68,7 +105,7 @@ class Retriever:
                     "document": "text content",
                     "metadata": {...},
                     "distance": 0.85,
-                    "score": 0.15  # 1 - distance
+                    "score": 0.65  # 1 - distance = similarità coseno
                 },
                 ...
             ]
@@ -80,12 +117,23 @@ class Retriever:
             ...     filter_metadata={"source": "ml_book.pdf"}
             ... )
         """
-        k = k or self.top_k
-        min_score = min_score or (1 - self.similarity_threshold)
+        # None = default da config (min_score=0.0 è una soglia valida)
+        if k is None:
+            k = self.top_k
+        if min_score is None:
+            min_score = 1 - self.similarity_threshold
 
         logger.debug(f"[RETRIEVE] Query: '{query[:50]}...'")
         logger.debug(f"           Top-K: {k}, Min score: {min_score}")
 
+        cache_key = self._cache_key(query, k, filter_metadata, min_score)
+        with self._cache_lock:
+            cached = self._cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"[CACHE] Hit ({len(cached)} results)")
+            # Copie: il chiamante può modificare i risultati
+            return [dict(r) for r in cached]
+
         try:
             # Query vector store
             results = self.vector_store.similarity_search(
@@ -94,27 +142,167 @@ class Retriever:
                 filter=filter_metadata
             )
 
-            # Add score field (1 - distance)
+            # Add score field (1 - distance) e filtra per min_score in un solo passaggio:
+            # Chroma restituisce i risultati per distanza crescente, quindi al primo
+            # score sotto soglia anche tutti i successivi lo sono
+            filtered_results = []
             for result in results:
-                if result.get('distance') is not None:
-                    result['score'] = 1 - result['distance']
-                else:
-                    result['score'] = 1.0
-
-            # Filter by min_score
-            filtered_results = [
-                r for r in results
-                if r['score'] >= min_score
-            ]
+                distance = result.get('distance')
+                result['score'] = 1 - distance if distance is not None else 1.0
+                if result['score'] < min_score:
+                    break
+                filtered_results.append(result)
 
             logger.debug(f"[OK] Retrieved {len(filtered_results)} results (filtered from {len(results)})")
 
+            # Risultati vuoti non in cache (similarity_search ritorna [] anche su errore)
+            if filtered_results:
+                with self._cache_lock:
+                    self._cache[cache_key] = [dict(r) for r in filtered_results]
+
             return filtered_results
 
         except Exception as e:
             logger.error(f"[ERROR] Retrieval failed: {e}")
             return []
 
+    async def retrieve_async(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        min_score: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Come retrieve, eseguito in un thread (non blocca l'event loop).
+
+        Example:
+            >>> results = await retriever.retrieve_async("What is AI?", k=3)
+        """
+        return await asyncio.to_thread(self.retrieve, query, k, filter_metadata, min_score)
+
+    def mmr_rerank(
+        self,
+        query_embedding: np.ndarray,
+        candidates: List[Dict[str, Any]],
+        k: Optional[int] = None,
+        lambda_: float = 0.5
+    ) -> List[Dict[str, Any]]:
+        """
+        Rerank Maximal Marginal Relevance dei candidati.
+
+        A ogni passo sceglie il candidato che massimizza
+        lambda_ * sim(query) - (1 - lambda_) * max sim(già scelti):
+        evita chunks quasi duplicati nel contesto del LLM.
+
+        Args:
+            query_embedding: Embedding della query
+            candidates: Risultati con chiave "embedding" (similarity_search con include_embeddings)
+            k: Numero risultati (default: da config)
+            lambda_: 1.0 = solo rilevanza, 0.0 = solo diversità
+
+        Returns:
+            Fino a k candidati in ordine MMR
+        """
+        k = min(k or self.top_k, len(candidates))
+        if k <= 0:
+            return []
+
+        vectors = np.asarray([c["embedding"] for c in candidates], dtype=np.float32)
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(1, -1)
+
+        query_sims = _cosine_similarities(query, vectors)[0]
+        pairwise_sims = _cosine_similarities(vectors, vectors)
+
+        selected: List[int] = []
+        max_sim_selected = np.full(len(candidates), -np.inf, dtype=np.float32)
+        available = np.ones(len(candidates), dtype=bool)
+
+        for _ in range(k):
+            if selected:
+                scores = lambda_ * query_sims - (1 - lambda_) * max_sim_selected
+            else:
+                scores = query_sims.copy()
+            scores[~available] = -np.inf
+
+            best = int(np.argmax(scores))
+            selected.append(best)
+            available[best] = False
+            np.maximum(max_sim_selected, pairwise_sims[:, best], out=max_sim_selected)
+
+        return [candidates[i] for i in selected]
+
+    def retrieve_mmr(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        fetch_k: Optional[int] = None,
+        lambda_: float = 0.5,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieval con rerank MMR: recupera fetch_k candidati e ne sceglie k diversi.
+
+        Args:
+            query: Query testuale
+            k: Numero risultati (default: da config)
+            fetch_k: Candidati da recuperare (default: 4 * k)
+            lambda_: Bilanciamento rilevanza/diversità (vedi mmr_rerank)
+            filter_metadata: Filtri metadata opzionali
+
+        Returns:
+            Risultati come retrieve() (con "score"), senza la chiave "embedding"
+
+        Example:
+            >>> results = retriever.retrieve_mmr("What is AI?", k=5)
+        """
+        k = k or self.top_k
+        fetch_k = fetch_k or 4 * k
+
+        try:
+            candidates = self.vector_store.similarity_search(
+                query=query,
+                k=fetch_k,
+                filter=filter_metadata,
+                include_embeddings=True
+            )
+            if not candidates:
+                return []
+
+            reranked = self.mmr_rerank(
+                self.vector_store.embed_query(query), candidates, k=k, lambda_=lambda_
+            )
+
+            for result in reranked:
+                del result["embedding"]
+                distance = result.get('distance')
+                result['score'] = 1 - distance if distance is not None else 1.0
+
+            return reranked
+
+        except Exception as e:
+            logger.error(f"[ERROR] MMR retrieval failed: {e}")
+            return []
+
+    def _cache_key(
+        self,
+        query: str,
+        k: int,
+        filter_metadata: Optional[Dict[str, Any]],
+        min_score: float
+    ) -> Hashable:
+        """
+        Chiave cache per retrieve(), legata alla versione del vector store.
+
+        Il filtro è serializzato in JSON a chiavi ordinate: chiave stabile e
+        hashable anche per filtri annidati (es: {"$and": [...]}).
+
+        Returns:
+            Tuple hashable
+        """
+        filter_key = json.dumps(filter_metadata, sort_keys=True, default=str) if filter_metadata else None
+        return (getattr(self.vector_store, "version", None), query, k, filter_key, min_score)
+
     def format_context(self, results: List[Dict[str, Any]]) -> str:
         """
         Formatta risultati retrieval in context string per LLM.
@@ -133,18 +321,11 @@ class Retriever:
         if not results:
             return ""
 
-        context_parts = []
-
-        for i, result in enumerate(results, 1):
-            text = result.get('document', '')
-
-            context_part = f"""
-Document {i}:
-Content: {text}
-"""
-            context_parts.append(context_part.strip())
-
-        return "\n\n---\n\n".join(context_parts)
+        # Un solo join su una comprehension (rstrip: stesso output del vecchio strip)
+        return "\n\n---\n\n".join([
+            f"Document {i}:\nContent: {result.get('document', '')}".rstrip()
+            for i, result in enumerate(results, 1)
+        ])
 
     def format_sources(self, results: List[Dict[str, Any]]) -> str:
         """
@@ -163,24 +344,18 @@ Content: {text}
         if not results:
             return ""
 
-        citations = "\n\n**Fonti:**\n"
-
-        # Raggruppa per source
-        sources_set = set()
+        # Raggruppa per source (dict: deduplica in un solo passaggio)
+        sources = {}
         for result in results:
-            metadata = result.get('metadata', {})
+            metadata = result.get('metadata') or {}
             source = metadata.get('source', 'Unknown')
             page = metadata.get('page')
+            sources[f"{source} (pag. {page})" if page else source] = None
 
-            if page:
-                sources_set.add(f"{source} (pag. {page})")
-            else:
-                sources_set.add(source)
-
-        for i, source in enumerate(sorted(sources_set), 1):
-            citations += f"{i}. {source}\n"
-
-        return citations
+        # Righe unite una sola volta (niente += in loop)
+        return "\n\n**Fonti:**\n" + "\n".join(
+            f"{i}. {source}" for i, source in enumerate(sorted(sources), 1)
+        ) + "\n"
 
 
 
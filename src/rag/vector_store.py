@@ -9,17 +9,266 @@ IMPORTANTE per STUDENTI:
 - Ogni documento è splittato in chunks con metadata
 """
 
-import chromadb
-from chromadb.config import Settings
-from typing import List, Dict, Optional, Any
+import asyncio
+import json
+import threading
+import numpy as np
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, repeat
+from typing import Callable, List, Dict, Optional, Any, Set, Tuple
 from datetime import datetime
 
-from config import rag_config, paths_config
+from cachetools import LRUCache
+
+from config import llm_config, rag_config, paths_config
 from src.utils.logger import get_logger
-from src.utils.helpers import get_directory_size_mb
+from src.utils.helpers import get_directory_size_mb_cached
+from src.utils.shared_clients import get_async_openai_client
 
 logger = get_logger(__name__)
 
+# ChromaDB importato al primo VectorStoreManager (stack HNSW/SQLite pesante:
+# chi importa il modulo senza usarlo non paga il costo)
+_chromadb = None
+
+
+def _get_chromadb():
+    """Importa chromadb (una sola volta) e lo restituisce."""
+    global _chromadb
+    if _chromadb is None:
+        import chromadb
+        import chromadb.config
+        _chromadb = chromadb
+    return _chromadb
+
+
+# Query → embedding tenuti in cache (LRU, ~6 KB ciascuno a 1536 dimensioni)
+QUERY_EMBEDDING_CACHE_SIZE = 512
+
+# Testi per singola richiesta embeddings (l'API ne accetta fino a 2048)
+EMBEDDING_BATCH_SIZE = 256
+
+# Richieste embeddings parallele per add_document (sync)
+EMBEDDING_MAX_WORKERS = 4
+
+# Retry SDK OpenAI (backoff esponenziale, rispetta Retry-After sui 429)
+EMBEDDING_MAX_RETRIES = 6
+
+# Scritture accodate (add_document_batched): chunks massimi per collection.add
+INGEST_MAX_BATCH = 500
+
+# Coalescing query concorrenti: finestra di attesa e dimensione massima batch
+SEARCH_BATCH_WINDOW = 0.02  # secondi
+SEARCH_BATCH_MAX = 8
+
+# Distanza HNSW: embeddings normalizzati (norma 1) → inner product = cosine
+# distance (1 - cos, 0=identico, 2=opposto), calcolata con un solo prodotto scalare
+HNSW_SPACE = "ip"
+
+# Fattore per riportare le distanze Chroma a cosine distance (1 - cos) in base
+# allo spazio della collection: le collection create prima di HNSW_SPACE="ip"
+# sono "l2" (distanza L2 al quadrato = 2 - 2·cos su vettori a norma 1)
+_COSINE_DISTANCE_SCALE = {"l2": 0.5, "ip": 1.0, "cosine": 1.0}
+
+
+def _normalize(embeddings: List[List[float]]) -> np.ndarray:
+    """Normalizza gli embeddings a norma 1 (float32, una riga per embedding)."""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=-1, keepdims=True) + 1e-12
+    return matrix
+
+
+def _unique_texts(texts: List[str]) -> Tuple[List[str], List[int]]:
+    """
+    Testi distinti (in ordine di prima apparizione) e, per ogni testo,
+    la posizione del suo duplicato in quella lista.
+
+    Example:
+        >>> _unique_texts(["a", "b", "a"])
+        (['a', 'b'], [0, 1, 0])
+    """
+    index: Dict[str, int] = {}
+    positions = [index.setdefault(text, len(index)) for text in texts]
+    return list(index), positions
+
+
+# Campi del risultato Chroma restituiti a ogni query del batch
+_QUERY_RESULT_FIELDS = ("ids", "documents", "metadatas", "distances", "embeddings")
+
+# Include di collection.query quando servono anche gli embeddings (es: rerank MMR)
+_QUERY_INCLUDE_EMBEDDINGS = ["documents", "metadatas", "distances", "embeddings"]
+
+
+class _PendingSearch:
+    """Query in attesa dentro un batch (embedding + risultato/errore)."""
+
+    __slots__ = ("embedding", "done", "result", "error")
+
+    def __init__(self, embedding: List[float]):
+        self.embedding = embedding
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+
+
+class _PendingAdd:
+    """Chunks pronti per collection.add, in attesa nella coda di ingestion."""
+
+    __slots__ = ("doc_id", "ids", "documents", "metadatas", "embeddings", "future")
+
+    def __init__(self, doc_id, ids, documents, metadatas, embeddings, future):
+        self.doc_id = doc_id
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.embeddings = embeddings
+        self.future = future
+
+
+class _SearchBatch:
+    """Query con stessi (k, filtro) da eseguire in una sola chiamata Chroma."""
+
+    __slots__ = ("items", "full")
+
+    def __init__(self):
+        self.items: List[_PendingSearch] = []
+        self.full = threading.Event()
+
+
+class BatchedSearcher:
+    """
+    Raggruppa query concorrenti in una sola collection.query.
+
+    La prima query di un gruppo (stessi k e filtro) fa da leader: se un'altra
+    ricerca è già in corso attende fino a SEARCH_BATCH_WINDOW (o finché il
+    batch arriva a SEARCH_BATCH_MAX query), poi esegue una sola chiamata con
+    tutti gli embeddings e consegna a ognuno la sua parte. Una query isolata
+    parte subito: nessuna latenza aggiunta a traffico basso.
+
+    Thread-safe: le query arrivano dai thread dei retriever.
+
+    Example:
+        >>> searcher = BatchedSearcher(collection.query)
+        >>> results = searcher.submit(query_embedding, k=5)
+    """
+
+    def __init__(
+        self,
+        query_fn: Callable[..., Dict[str, Any]],
+        window: float = SEARCH_BATCH_WINDOW,
+        max_batch: int = SEARCH_BATCH_MAX
+    ):
+        """
+        Inizializza BatchedSearcher.
+
+        Args:
+            query_fn: Funzione con firma di collection.query
+            window: Attesa massima del leader in secondi
+            max_batch: Query massime per batch
+        """
+        self._query_fn = query_fn
+        self.window = window
+        self.max_batch = max_batch
+
+        self._lock = threading.Lock()
+        self._batches: Dict[Any, _SearchBatch] = {}
+        self._inflight = 0
+
+    def submit(
+        self,
+        embedding: List[float],
+        k: int,
+        where: Optional[Dict[str, Any]] = None,
+        include_embeddings: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Esegue la query (eventualmente in batch con altre).
+
+        Args:
+            embedding: Embedding della query
+            k: Numero risultati
+            where: Filtro metadata opzionale
+            include_embeddings: Restituisce anche gli embeddings dei risultati
+
+        Returns:
+            Risultato in formato collection.query con una sola query
+            (es: {"ids": [[...]], "documents": [[...]], ...})
+        """
+        key = (k, json.dumps(where, sort_keys=True, default=str), include_embeddings)
+        pending = _PendingSearch(embedding)
+
+        with self._lock:
+            batch = self._batches.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._batches[key] = _SearchBatch()
+                busy = self._inflight > 0
+            batch.items.append(pending)
+            if len(batch.items) >= self.max_batch:
+                # Batch pieno: le prossime query aprono un nuovo batch
+                del self._batches[key]
+                batch.full.set()
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.result
+
+        if busy:
+            batch.full.wait(self.window)
+
+        with self._lock:
+            if self._batches.get(key) is batch:
+                del self._batches[key]
+            self._inflight += 1
+
+        try:
+            self._run(batch.items, k, where, include_embeddings)
+        finally:
+            with self._lock:
+                self._inflight -= 1
+
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _run(
+        self,
+        items: List[_PendingSearch],
+        k: int,
+        where: Optional[Dict[str, Any]],
+        include_embeddings: bool
+    ) -> None:
+        """Esegue il batch e distribuisce risultati (o l'errore) alle query."""
+        try:
+            extra = {"include": _QUERY_INCLUDE_EMBEDDINGS} if include_embeddings else {}
+            results = self._query_fn(
+                query_embeddings=[item.embedding for item in items],
+                n_results=k,
+                where=where,
+                **extra
+            )
+            if len(items) > 1:
+                logger.debug(f"🔍 Batched {len(items)} queries in one Chroma call")
+
+            for i, item in enumerate(items):
+                item.result = {
+                    field: [results[field][i]]
+                    for field in _QUERY_RESULT_FIELDS
+                    if results.get(field) is not None
+                }
+
+        except BaseException as e:
+            for item in items:
+                item.error = e
+            raise
+
+        finally:
+            for item in items:
+                item.done.set()
+
 
 class VectorStoreManager:
     """
@@ -42,6 +291,9 @@ class VectorStoreManager:
         >>> results = vs.similarity_search("query", k=3)
     """
 
+    # Semaforo condiviso per le richieste embeddings, creato al primo uso dentro l'event loop
+    _semaphore: Optional[asyncio.Semaphore] = None
+
     def __init__(
         self,
         persist_directory: Optional[str] = None,
@@ -61,6 +313,26 @@ class VectorStoreManager:
         self.persist_directory = persist_directory or paths_config.VECTORDB_DIR
         self.collection_name = collection_name or rag_config.COLLECTION_NAME
 
+        # Versione contenuti: incrementata a ogni modifica, entra nella chiave
+        # della cache risultati del Retriever (invalidazione senza svuotarla)
+        self._version = 0
+
+        # Cache query → embedding (evita una chiamata OpenAI per query ripetute)
+        self._embed_cache: LRUCache = LRUCache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+        self._cache_lock = threading.RLock()
+
+        # Ultimo list_all_documents con la versione a cui è stato calcolato
+        # (valido finché nessun add/delete/update cambia la versione)
+        self._docs_cache: Optional[Tuple[int, List[Dict[str, Any]]]] = None
+
+        # Query concorrenti raggruppate in una sola chiamata Chroma
+        self._searcher = BatchedSearcher(self._query_collection)
+
+        # Coda scritture: upload concorrenti uniti in un solo collection.add
+        # (worker avviato al primo uso, dentro l'event loop del bot)
+        self._ingest_queue: Optional[asyncio.Queue] = None
+        self._ingest_worker: Optional[asyncio.Task] = None
+
         logger.info(f"📦 Inizializzazione VectorStoreManager...")
         logger.info(f"   Directory: {self.persist_directory}")
         logger.info(f"   Collection: {self.collection_name}")
@@ -69,9 +341,10 @@ class VectorStoreManager:
         # CRITICAL: PersistentClient Setup
         # ========================================
         try:
+            chromadb = _get_chromadb()
             self.client = chromadb.PersistentClient(
                 path=self.persist_directory,
-                settings=Settings(
+                settings=chromadb.config.Settings(
                     anonymized_telemetry=False,  # Disabilita telemetria
                     allow_reset=False  # Sicurezza: non permettere reset accidentale
                 )
@@ -96,27 +369,34 @@ class VectorStoreManager:
             # e passeremo gli embeddings pre-calcolati in add_document()
 
             logger.info(f"   Embedding model: {rag_config.EMBEDDING_MODEL}")
+            if rag_config.EMBEDDING_DIMENSIONS:
+                logger.info(f"   Embedding dimensions: {rag_config.EMBEDDING_DIMENSIONS}")
             logger.info("   Note: Using explicit embeddings (not auto-generated)")
 
             # Get or create collection SENZA embedding_function
+            # Nota: lo spazio HNSW vale solo per collection nuove
+            # (una collection esistente mantiene quello con cui è stata creata)
             self.collection = self.client.get_or_create_collection(
                 name=self.collection_name,
-                metadata={
-                    "description": "Educational bot documents collection",
-                    "embedding_model": rag_config.EMBEDDING_MODEL,
-                    "embedding_mode": "explicit"  # Embeddings passed explicitly
-                }
+                metadata=self._collection_metadata()
             )
+            self._distance_scale = self._distance_scale_for(self.collection)
             logger.info(f"✅ Collection '{self.collection_name}' pronta")
             logger.info(f"   Chunks esistenti: {self.collection.count()}")
 
+            # Doc IDs presenti, tenuti in memoria (get_stats senza scan completo)
+            self._doc_ids: Set[str] = self._load_doc_ids()
+            logger.info(f"   Documenti esistenti: {len(self._doc_ids)}")
+
             # Initialize embedder once (reused across methods)
             from langchain_openai import OpenAIEmbeddings
             from config import api_keys
 
             self.embedder = OpenAIEmbeddings(
                 model=rag_config.EMBEDDING_MODEL,
-                openai_api_key=api_keys.OPENAI_API_KEY
+                openai_api_key=api_keys.OPENAI_API_KEY,
+                dimensions=rag_config.EMBEDDING_DIMENSIONS or None,
+                max_retries=EMBEDDING_MAX_RETRIES
             )
             logger.info("✅ OpenAI Embedder initialized")
 
@@ -129,7 +409,8 @@ class VectorStoreManager:
         chunks: List[str],
         metadatas: List[Dict[str, Any]],
         doc_id: str,
-        embeddings: Optional[List[List[float]]] = None
+        embeddings: Optional[List[List[float]]] = None,
+        start_index: int = 0
     ) -> int:
         """
         Aggiunge documento al vector store.
@@ -146,6 +427,7 @@ class VectorStoreManager:
             metadatas: Lista metadata per ogni chunk
             doc_id: ID documento univoco
             embeddings: Embeddings pre-calcolati (opzionale)
+            start_index: Indice del primo chunk (per aggiunte a batch dello stesso documento)
 
         Returns:
             Numero chunks aggiunti
@@ -161,20 +443,7 @@ class VectorStoreManager:
             ... ]
             >>> num_added = vs.add_document(chunks, metadatas, "doc_123")
         """
-        if len(chunks) != len(metadatas):
-            raise ValueError(
-                f"Chunks ({len(chunks)}) e metadatas ({len(metadatas)}) "
-                "devono avere stessa lunghezza"
-            )
-
-        # Genera IDs univoci per ogni chunk
-        chunk_ids = [f"{doc_id}_chunk_{i}" for i in range(len(chunks))]
-
-        # Aggiungi timestamp a metadata
-        timestamp = datetime.now().isoformat()
-        for metadata in metadatas:
-            metadata["doc_id"] = doc_id
-            metadata["timestamp"] = timestamp
+        chunk_ids, metadatas = self._prepare_add(chunks, metadatas, doc_id, start_index)
 
         logger.info(f"📝 Aggiunta documento '{doc_id}' con {len(chunks)} chunks...")
 
@@ -182,18 +451,18 @@ class VectorStoreManager:
             # Se embeddings non forniti, calcolali con OpenAI
             if not embeddings:
                 logger.info("   Calculating embeddings with OpenAI...")
-                # Usa embedder pre-inizializzato (evita duplicazione)
-                embeddings = self.embedder.embed_documents(chunks)
+                embeddings = self._embed_documents(chunks)
                 logger.info(f"   ✅ Generated {len(embeddings)} embeddings")
 
-            # Add to ChromaDB con embeddings espliciti
+            # Add to ChromaDB con embeddings espliciti (normalizzati per HNSW_SPACE)
             self.collection.add(
                 ids=chunk_ids,
                 documents=chunks,
                 metadatas=metadatas,
-                embeddings=embeddings
+                embeddings=_normalize(embeddings)
             )
 
+            self._mark_added([doc_id])
             logger.info(f"✅ Documento '{doc_id}' aggiunto con successo")
             return len(chunks)
 
@@ -201,6 +470,336 @@ class VectorStoreManager:
             logger.error(f"❌ Errore aggiunta documento: {e}")
             raise
 
+    @staticmethod
+    def _collection_metadata() -> Dict[str, Any]:
+        """Metadata (e spazio HNSW) con cui creare la collection."""
+        return {
+            "description": "Educational bot documents collection",
+            "embedding_model": rag_config.EMBEDDING_MODEL,
+            "embedding_dimensions": rag_config.EMBEDDING_DIMENSIONS,  # 0 = native
+            "embedding_mode": "explicit",  # Embeddings passed explicitly
+            "hnsw:space": HNSW_SPACE
+        }
+
+    @staticmethod
+    def _distance_scale_for(collection) -> float:
+        """
+        Fattore distanza Chroma → cosine distance per lo spazio HNSW della collection.
+
+        Così SIMILARITY_THRESHOLD filtra allo stesso modo collection vecchie
+        ("l2") e nuove ("ip").
+        """
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        if space not in _COSINE_DISTANCE_SCALE:
+            logger.warning(f"⚠️ Spazio HNSW sconosciuto '{space}': distanze non convertite")
+        else:
+            logger.info(f"   Spazio HNSW: {space}")
+        return _COSINE_DISTANCE_SCALE.get(space, 1.0)
+
+    def _load_doc_ids(self) -> Set[str]:
+        """
+        Doc IDs presenti nella collection (scan una tantum all'avvio).
+
+        Legge solo gli IDs dei chunks ("<doc_id>_chunk_<n>"), senza
+        documenti, metadata né embeddings.
+        """
+        ids = self.collection.get(include=[])['ids']
+        return {chunk_id.rsplit("_chunk_", 1)[0] for chunk_id in ids}
+
+    @property
+    def version(self) -> int:
+        """Versione corrente dei contenuti (cambia a ogni add/delete/update/clear)."""
+        return self._version
+
+    @property
+    def document_count(self) -> int:
+        """Numero documenti presenti (O(1), senza query alla collection)."""
+        return len(self._doc_ids)
+
+    def _bump_version(self) -> None:
+        """Invalida le cache di retrieval dopo una modifica dei documenti."""
+        with self._cache_lock:
+            self._version += 1
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Embedding della query, dalla cache se già calcolato.
+
+        L'embedding dipende solo dal testo della query (non dai documenti né
+        dal tempo: il modello non cambia durante il processo), quindi non viene
+        mai invalidato; esce solo per LRU. L'array restituito è read-only
+        (condiviso tra i chiamanti).
+
+        Spazi iniziali/finali e ripetuti vengono normalizzati prima di
+        embeddare: "ciao  come stai?\n" e "ciao come stai?" condividono la
+        stessa voce di cache (e la stessa chiamata API).
+        """
+        query = " ".join(query.split())
+
+        with self._cache_lock:
+            embedding = self._embed_cache.get(query)
+        if embedding is not None:
+            logger.debug("   Query embedding cache hit")
+            return embedding
+
+        embedding = _normalize(self.embedder.embed_query(query))
+        embedding.flags.writeable = False
+
+        with self._cache_lock:
+            self._embed_cache[query] = embedding
+        return embedding
+
+    def _embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeddings con l'embedder pre-inizializzato, in batch paralleli.
+
+        I testi sono divisi in batch da EMBEDDING_BATCH_SIZE, embeddati da
+        EMBEDDING_MAX_WORKERS thread e riassemblati in ordine.
+        """
+        unique, positions = _unique_texts(texts)
+        if len(unique) < len(texts):
+            embeddings = self._embed_documents(unique)
+            return [embeddings[i] for i in positions]
+
+        if len(texts) <= EMBEDDING_BATCH_SIZE:
+            return self.embedder.embed_documents(texts)
+
+        batches = [
+            texts[i:i + EMBEDDING_BATCH_SIZE]
+            for i in range(0, len(texts), EMBEDDING_BATCH_SIZE)
+        ]
+        with ThreadPoolExecutor(max_workers=min(EMBEDDING_MAX_WORKERS, len(batches))) as pool:
+            return list(chain.from_iterable(pool.map(self.embedder.embed_documents, batches)))
+
+    def _query_collection(self, **kwargs) -> Dict[str, Any]:
+        """collection.query sulla collection corrente (ricreata da clear_all)."""
+        return self.collection.query(**kwargs)
+
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        """Restituisce il semaforo che limita le richieste embeddings concorrenti."""
+        if cls._semaphore is None:
+            cls._semaphore = asyncio.Semaphore(llm_config.MAX_CONCURRENCY)
+        return cls._semaphore
+
+    async def embed_documents_async(self, texts: List[str]) -> List[List[float]]:
+        """
+        Calcola gli embeddings con richieste batch parallele (AsyncOpenAI).
+
+        I testi sono divisi in batch da EMBEDDING_BATCH_SIZE, inviati in
+        parallelo con asyncio.gather e riassemblati in ordine.
+
+        STUDENTI: Chunk identici (intestazioni, piè di pagina, pagine vuote
+        ripetute) vengono embeddati una volta sola e l'embedding è riusato.
+
+        Args:
+            texts: Testi da embeddare
+
+        Returns:
+            Lista embeddings (stesso ordine di texts)
+        """
+        unique, positions = _unique_texts(texts)
+        if len(unique) < len(texts):
+            logger.debug(f"   {len(texts) - len(unique)} chunks duplicati: embedding riusato")
+            embeddings = await self.embed_documents_async(unique)
+            return [embeddings[i] for i in positions]
+
+        client = get_async_openai_client()
+        dimensions = {"dimensions": rag_config.EMBEDDING_DIMENSIONS} if rag_config.EMBEDDING_DIMENSIONS else {}
+
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with self._get_semaphore():
+                response = await client.embeddings.create(
+                    model=rag_config.EMBEDDING_MODEL,
+                    input=batch,
+                    **dimensions
+                )
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+        results = await asyncio.gather(*(
+            embed_batch(texts[i:i + EMBEDDING_BATCH_SIZE])
+            for i in range(0, len(texts), EMBEDDING_BATCH_SIZE)
+        ))
+        return [embedding for batch in results for embedding in batch]
+
+    async def add_document_async(
+        self,
+        chunks: List[str],
+        metadatas: List[Dict[str, Any]],
+        doc_id: str,
+        start_index: int = 0
+    ) -> int:
+        """
+        Come add_document, ma con embeddings calcolati in batch paralleli (async).
+
+        Args:
+            chunks: Lista testi chunks
+            metadatas: Lista metadata per ogni chunk
+            doc_id: ID documento univoco
+            start_index: Indice del primo chunk (per aggiunte a batch dello stesso documento)
+
+        Returns:
+            Numero chunks aggiunti
+
+        Raises:
+            ValueError: Se chunks e metadatas hanno lunghezze diverse
+
+        Example:
+            >>> num_added = await vs.add_document_async(chunks, metadatas, "doc_123")
+        """
+        if len(chunks) != len(metadatas):
+            raise ValueError(
+                f"Chunks ({len(chunks)}) e metadatas ({len(metadatas)}) "
+                "devono avere stessa lunghezza"
+            )
+
+        logger.info(f"   Calculating embeddings with OpenAI ({len(chunks)} chunks, async batches)...")
+        embeddings = await self.embed_documents_async(chunks)
+        logger.info(f"   ✅ Generated {len(embeddings)} embeddings")
+
+        return await self.add_document_batched(
+            chunks=chunks,
+            metadatas=metadatas,
+            doc_id=doc_id,
+            embeddings=embeddings,
+            start_index=start_index
+        )
+
+    def _prepare_add(
+        self,
+        chunks: List[str],
+        metadatas: List[Dict[str, Any]],
+        doc_id: str,
+        start_index: int
+    ) -> tuple:
+        """
+        Valida input e prepara IDs e metadata dei chunks da aggiungere.
+
+        Returns:
+            Tuple (chunk_ids, metadatas con doc_id e timestamp)
+
+        Raises:
+            ValueError: Se chunks e metadatas hanno lunghezze diverse
+        """
+        if len(chunks) != len(metadatas):
+            raise ValueError(
+                f"Chunks ({len(chunks)}) e metadatas ({len(metadatas)}) "
+                "devono avere stessa lunghezza"
+            )
+
+        # Genera IDs univoci per ogni chunk
+        chunk_ids = [f"{doc_id}_chunk_{i}" for i in range(start_index, start_index + len(chunks))]
+
+        # Aggiungi doc_id e timestamp a metadata (copie: i dict del chiamante restano intatti)
+        timestamp = datetime.now().isoformat()
+        metadatas = [
+            {**metadata, "doc_id": doc_id, "timestamp": timestamp}
+            for metadata in metadatas
+        ]
+        return chunk_ids, metadatas
+
+    def _mark_added(self, doc_ids: List[str]) -> None:
+        """Registra i documenti aggiunti e invalida le cache di retrieval."""
+        with self._cache_lock:
+            self._doc_ids.update(doc_ids)
+        self._bump_version()
+
+    async def add_document_batched(
+        self,
+        chunks: List[str],
+        metadatas: List[Dict[str, Any]],
+        doc_id: str,
+        embeddings: List[List[float]],
+        start_index: int = 0
+    ) -> int:
+        """
+        Accoda chunks con embeddings già calcolati per una scrittura raggruppata.
+
+        Un worker in background scrive in ChromaDB (in un thread): mentre una
+        scrittura è in corso, i chunks di altri upload concorrenti si accodano
+        e finiscono tutti nel collection.add successivo (fino a
+        INGEST_MAX_BATCH chunks). Un upload isolato viene scritto subito.
+
+        Args:
+            chunks: Lista testi chunks
+            metadatas: Lista metadata per ogni chunk
+            doc_id: ID documento univoco
+            embeddings: Embeddings dei chunks
+            start_index: Indice del primo chunk
+
+        Returns:
+            Numero chunks aggiunti (dopo la scrittura effettiva)
+
+        Raises:
+            ValueError: Se chunks e metadatas hanno lunghezze diverse
+        """
+        chunk_ids, metadatas = self._prepare_add(chunks, metadatas, doc_id, start_index)
+
+        if self._ingest_worker is None or self._ingest_worker.done():
+            self._ingest_queue = asyncio.Queue()
+            self._ingest_worker = asyncio.create_task(self._ingest_loop(self._ingest_queue))
+
+        future = asyncio.get_running_loop().create_future()
+        await self._ingest_queue.put(_PendingAdd(
+            doc_id, chunk_ids, list(chunks), metadatas, _normalize(embeddings), future
+        ))
+        return await future
+
+    async def _ingest_loop(self, queue: asyncio.Queue) -> None:
+        """Worker: svuota la coda e scrive i chunks accodati a gruppi."""
+        batch: List[_PendingAdd] = []
+        try:
+            while True:
+                batch = [await queue.get()]
+                num_chunks = len(batch[0].ids)
+                while num_chunks < INGEST_MAX_BATCH and not queue.empty():
+                    item = queue.get_nowait()
+                    batch.append(item)
+                    num_chunks += len(item.ids)
+
+                logger.info(f"📝 Scrittura {num_chunks} chunks ({len(batch)} richieste)...")
+
+                try:
+                    await self._write_batch(batch)
+                except Exception as e:
+                    if len(batch) == 1:
+                        logger.error(f"❌ Errore aggiunta documento: {e}")
+                        if not batch[0].future.done():
+                            batch[0].future.set_exception(e)
+                    else:
+                        # Un upload non valido non deve far fallire quelli raggruppati con lui
+                        logger.warning(f"⚠️ Scrittura raggruppata fallita ({e}): riprovo per richiesta")
+                        for item in batch:
+                            try:
+                                await self._write_batch([item])
+                            except Exception as item_error:
+                                logger.error(f"❌ Errore aggiunta documento '{item.doc_id}': {item_error}")
+                                if not item.future.done():
+                                    item.future.set_exception(item_error)
+                batch = []
+        finally:
+            # Worker terminato (es: cancellato allo shutdown): nessun upload resta in attesa
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(RuntimeError("Scrittura chunks interrotta"))
+
+    async def _write_batch(self, batch: List[_PendingAdd]) -> None:
+        """Scrive le richieste in un solo collection.add e ne risolve i future."""
+        await asyncio.to_thread(
+            self.collection.add,
+            ids=[chunk_id for item in batch for chunk_id in item.ids],
+            documents=[doc for item in batch for doc in item.documents],
+            metadatas=[metadata for item in batch for metadata in item.metadatas],
+            embeddings=np.concatenate([item.embeddings for item in batch])
+        )
+        self._mark_added([item.doc_id for item in batch])
+
+        for item in batch:
+            if not item.future.done():
+                item.future.set_result(len(item.ids))
+
     def delete_document(self, doc_id: str) -> int:
         """
         Elimina documento e tutti i suoi chunks dal vector store.
@@ -215,37 +814,100 @@ class VectorStoreManager:
             >>> deleted_count = vs.delete_document("doc_123")
             >>> print(f"Eliminati {deleted_count} chunks")
         """
+        return self._delete(doc_id, with_metadata=False)[0]
+
+    def pop_document(self, doc_id: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """
+        Elimina documento restituendo anche i suoi metadata.
+
+        Una sola lettura dalla collection al posto di get_document_info +
+        delete_document (es: per mostrare il nome del file eliminato).
+
+        Args:
+            doc_id: ID documento da eliminare
+
+        Returns:
+            Tuple (numero chunks eliminati, metadata del primo chunk);
+            (0, None) se il documento non esiste
+
+        Example:
+            >>> num_deleted, metadata = vs.pop_document("doc_123")
+            >>> if num_deleted:
+            ...     print(f"Eliminato {metadata['source']}")
+        """
+        return self._delete(doc_id, with_metadata=True)
+
+    def _delete(self, doc_id: str, with_metadata: bool) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """Elimina i chunks del documento per ID (trovati con una sola get)."""
         logger.info(f"🗑️  Eliminazione documento '{doc_id}'...")
 
         try:
             # Query per trovare tutti chunks del documento
             results = self.collection.get(
-                where={"doc_id": doc_id}
+                where={"doc_id": doc_id},
+                include=['metadatas'] if with_metadata else []  # Altrimenti solo gli IDs
             )
 
             if not results or not results['ids']:
                 logger.warning(f"⚠️  Documento '{doc_id}' non trovato")
-                return 0
+                return 0, None
 
             num_chunks = len(results['ids'])
+            metadata = results['metadatas'][0] if with_metadata else None
 
-            # Delete by metadata filter
-            self.collection.delete(
-                where={"doc_id": doc_id}
-            )
+            # Delete per ID: il filtro sui metadata è già stato risolto dalla get
+            self.collection.delete(ids=results['ids'])
+            with self._cache_lock:
+                self._doc_ids.discard(doc_id)
+            self._bump_version()
 
             logger.info(f"✅ Documento '{doc_id}' eliminato ({num_chunks} chunks)")
-            return num_chunks
+            return num_chunks, metadata
 
         except Exception as e:
             logger.error(f"❌ Errore eliminazione documento: {e}")
             raise
 
-    def similarity_search(
+    async def delete_document_async(self, doc_id: str) -> int:
+        """Come delete_document, eseguito in un thread (non blocca l'event loop)."""
+        return await asyncio.to_thread(self.delete_document, doc_id)
+
+    async def pop_document_async(self, doc_id: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """Come pop_document, eseguito in un thread (non blocca l'event loop)."""
+        return await asyncio.to_thread(self.pop_document, doc_id)
+
+    async def update_document_summary_async(self, doc_id: str, new_summary: str) -> int:
+        """Come update_document_summary, eseguito in un thread (non blocca l'event loop)."""
+        return await asyncio.to_thread(self.update_document_summary, doc_id, new_summary)
+
+    async def get_document_info_async(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Come get_document_info, eseguito in un thread (non blocca l'event loop)."""
+        return await asyncio.to_thread(self.get_document_info, doc_id)
+
+    async def similarity_search_async(
         self,
         query: str,
         k: int = None,
         filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Come similarity_search, eseguito in un thread.
+
+        Embedding query e query ChromaDB non bloccano l'event loop: handler
+        concorrenti si sovrappongono (e le query vengono raggruppate da
+        BatchedSearcher).
+
+        Example:
+            >>> results = await vs.similarity_search_async("What is AI?", k=3)
+        """
+        return await asyncio.to_thread(self.similarity_search, query, k, filter)
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = None,
+        filter: Optional[Dict[str, Any]] = None,
+        include_embeddings: bool = False
     ) -> List[Dict[str, Any]]:
         """
         Esegue similarity search sul vector store.
@@ -254,6 +916,7 @@ class VectorStoreManager:
             query: Query testuale dell'utente
             k: Numero risultati da restituire (default: da config)
             filter: Filtri metadata opzionali (es: {"source": "doc.pdf"})
+            include_embeddings: Aggiunge "embedding" a ogni risultato (per rerank)
 
         Returns:
             Lista di risultati con format:
@@ -262,7 +925,7 @@ class VectorStoreManager:
                     "id": "doc_123_chunk_0",
                     "document": "text content",
                     "metadata": {"source": "doc.pdf", "page": 1, ...},
-                    "distance": 0.85
+                    "distance": 0.35  # cosine distance (1 - cos), per ogni spazio HNSW
                 },
                 ...
             ]
@@ -279,27 +942,45 @@ class VectorStoreManager:
         logger.debug(f"🔍 Similarity search: '{query}' (top-{k})")
 
         try:
-            # Calcola embedding query con embedder pre-inizializzato
-            query_embedding = self.embedder.embed_query(query)
-
-            # Query ChromaDB con embedding esplicito
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=k,
-                where=filter
+            # Calcola embedding query (cache, poi embedder pre-inizializzato)
+            query_embedding = self.embed_query(query)
+
+            # Query ChromaDB con embedding esplicito (batch con query concorrenti)
+            results = self._searcher.submit(
+                query_embedding,
+                k=k,
+                where=filter,
+                include_embeddings=include_embeddings
             )
 
-            # Format results
+            # Format results (zip sulle colonne, niente indicizzazione per risultato)
             formatted_results = []
 
             if results and results['ids'] and results['ids'][0]:
-                for i in range(len(results['ids'][0])):
-                    formatted_results.append({
-                        "id": results['ids'][0][i],
-                        "document": results['documents'][0][i],
-                        "metadata": results['metadatas'][0][i],
-                        "distance": results['distances'][0][i] if 'distances' in results else None
-                    })
+                ids = results['ids'][0]
+                if 'distances' in results:
+                    # Cosine distance anche per collection "l2" (vedi _distance_scale_for)
+                    scale = self._distance_scale
+                    distances = results['distances'][0]
+                    if scale != 1.0:
+                        distances = [distance * scale for distance in distances]
+                else:
+                    distances = repeat(None)
+                formatted_results = [
+                    {
+                        "id": chunk_id,
+                        "document": document,
+                        "metadata": metadata,
+                        "distance": distance
+                    }
+                    for chunk_id, document, metadata, distance in zip(
+                        ids, results['documents'][0], results['metadatas'][0], distances
+                    )
+                ]
+
+                if include_embeddings:
+                    for result, embedding in zip(formatted_results, results['embeddings'][0]):
+                        result["embedding"] = embedding
 
             logger.debug(f"✅ Trovati {len(formatted_results)} risultati")
             return formatted_results
@@ -330,45 +1011,57 @@ class VectorStoreManager:
             >>> docs = vs.list_all_documents()
             >>> for doc in docs:
             ...     print(f"{doc['source']}: {doc['num_chunks']} chunks")
+
+        STUDENTI: Il risultato resta in cache finché la versione dei contenuti
+        non cambia: /list_docs ripetuti e refresh_agent non riscandiscono
+        tutti i metadata della collection.
         """
+        with self._cache_lock:
+            version = self._version
+            cached = self._docs_cache
+
+        if cached is not None and cached[0] == version:
+            logger.debug("📋 Lista documenti dalla cache")
+            return list(cached[1])
+
         logger.debug("📋 Listing all documents...")
 
         try:
-            # Get all items
-            all_data = self.collection.get()
+            # Get all items (solo metadata: niente testo dei chunks)
+            all_data = self.collection.get(include=['metadatas'])
 
             if not all_data or not all_data['ids']:
                 logger.info("📭 Nessun documento nel database")
-                return []
-
-            # Aggrega per doc_id
-            docs_dict = {}
-
-            for i, chunk_id in enumerate(all_data['ids']):
-                metadata = all_data['metadatas'][i]
-                doc_id = metadata.get('doc_id', 'unknown')
-
-                if doc_id not in docs_dict:
-                    docs_dict[doc_id] = {
-                        "doc_id": doc_id,
-                        "source": metadata.get('source', 'Unknown'),
-                        "summary": metadata.get('summary', 'No summary available'),
-                        "num_chunks": 0,
-                        "timestamp": metadata.get('timestamp', 'N/A'),
-                        "pages": set()
-                    }
+                documents = []
+                self._store_docs_cache(version, documents)
+                return documents
+
+            # Aggrega per doc_id: conteggi con Counter (C), un solo passaggio
+            # per metadata del primo chunk e pagine
+            metadatas = all_data['metadatas']
+            doc_ids = [metadata.get('doc_id', 'unknown') for metadata in metadatas]
+            counts = Counter(doc_ids)
 
-                docs_dict[doc_id]["num_chunks"] += 1
+            first_metadata: Dict[str, Dict[str, Any]] = {}
+            pages_by_doc: Dict[str, set] = defaultdict(set)
+            for doc_id, metadata in zip(doc_ids, metadatas):
+                first_metadata.setdefault(doc_id, metadata)
 
                 # Aggiungi pagina se presente
                 if 'page' in metadata:
-                    docs_dict[doc_id]["pages"].add(metadata['page'])
+                    pages_by_doc[doc_id].add(metadata['page'])
 
-            # Convert to list e format pages
-            documents = []
-            for doc_data in docs_dict.values():
-                doc_data["pages"] = sorted(list(doc_data["pages"]))
-                documents.append(doc_data)
+            documents = [
+                {
+                    "doc_id": doc_id,
+                    "source": metadata.get('source', 'Unknown'),
+                    "summary": metadata.get('summary', 'No summary available'),
+                    "num_chunks": counts[doc_id],
+                    "timestamp": metadata.get('timestamp', 'N/A'),
+                    "pages": sorted(pages_by_doc.get(doc_id, ()))
+                }
+                for doc_id, metadata in first_metadata.items()
+            ]
 
             # Sort by timestamp (più recenti prima)
             documents.sort(
@@ -377,12 +1070,19 @@ class VectorStoreManager:
             )
 
             logger.info(f"✅ Trovati {len(documents)} documenti")
-            return documents
+            self._store_docs_cache(version, documents)
+            return list(documents)
 
         except Exception as e:
             logger.error(f"❌ Errore listing documents: {e}")
             return []
 
+    def _store_docs_cache(self, version: int, documents: List[Dict[str, Any]]) -> None:
+        """Salva la lista documenti, se nel frattempo la versione non è cambiata."""
+        with self._cache_lock:
+            if self._version == version:
+                self._docs_cache = (version, documents)
+
     def get_document_info(self, doc_id: str) -> Optional[Dict[str, Any]]:
         """
         Ottiene informazioni dettagliate su singolo documento.
@@ -400,7 +1100,8 @@ class VectorStoreManager:
         """
         try:
             results = self.collection.get(
-                where={"doc_id": doc_id}
+                where={"doc_id": doc_id},
+                include=['metadatas']
             )
 
             if not results or not results['ids']:
@@ -413,6 +1114,7 @@ class VectorStoreManager:
                 "source": metadatas[0].get('source', 'Unknown'),
                 "num_chunks": len(results['ids']),
                 "timestamp": metadatas[0].get('timestamp', 'N/A'),
+                "summary": metadatas[0].get('summary', ''),
                 "pages": sorted(set(m.get('page', 0) for m in metadatas))
             }
 
@@ -420,6 +1122,31 @@ class VectorStoreManager:
             logger.error(f"❌ Errore get document info: {e}")
             return None
 
+    def find_document_by_hash(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Cerca un documento già indicizzato con lo stesso contenuto.
+
+        Args:
+            content_hash: Hash del file originale (metadata "content_hash")
+
+        Returns:
+            Info documento (come get_document_info) o None se non presente
+        """
+        try:
+            results = self.collection.get(
+                where={"content_hash": content_hash},
+                limit=1,
+                include=['metadatas']
+            )
+        except Exception as e:
+            logger.error(f"❌ Errore ricerca hash documento: {e}")
+            return None
+
+        if not results or not results['ids']:
+            return None
+
+        return self.get_document_info(results['metadatas'][0]['doc_id'])
+
     def get_stats(self) -> Dict[str, Any]:
         """
         Ottiene statistiche del vector store.
@@ -440,12 +1167,12 @@ class VectorStoreManager:
         logger.debug("📊 Getting vector store stats...")
 
         try:
+            # Entrambi O(1): niente scan della collection
             total_chunks = self.collection.count()
-            documents = self.list_all_documents()
-            total_documents = len(documents)
+            total_documents = len(self._doc_ids)
 
-            # Calcola dimensione storage
-            storage_size_mb = get_directory_size_mb(self.persist_directory)
+            # Calcola dimensione storage (walk del disco, riusato per qualche secondo)
+            storage_size_mb = get_directory_size_mb_cached(self.persist_directory)
 
             stats = {
                 "total_chunks": total_chunks,
@@ -486,7 +1213,8 @@ class VectorStoreManager:
         try:
             # Get all chunks for this document
             results = self.collection.get(
-                where={"doc_id": doc_id}
+                where={"doc_id": doc_id},
+                include=['metadatas']
             )
 
             if not results or not results['ids']:
@@ -495,20 +1223,17 @@ class VectorStoreManager:
 
             num_chunks = len(results['ids'])
 
-            # Update metadata for each chunk
-            for i, chunk_id in enumerate(results['ids']):
-                # Get current metadata
-                current_metadata = results['metadatas'][i]
-
-                # Update summary field
-                current_metadata['summary'] = new_summary
-
-                # Update chunk with new metadata
-                self.collection.update(
-                    ids=[chunk_id],
-                    metadatas=[current_metadata]
-                )
+            # Update metadata di tutti i chunks in una sola chiamata (una transazione)
+            updated_metadatas = [
+                {**metadata, 'summary': new_summary}
+                for metadata in results['metadatas']
+            ]
+            self.collection.update(
+                ids=results['ids'],
+                metadatas=updated_metadatas
+            )
 
+            self._bump_version()
             logger.info(f"✅ Sommario aggiornato per {num_chunks} chunks")
             return num_chunks
 
@@ -538,9 +1263,13 @@ class VectorStoreManager:
             # Recreate empty collection
             self.collection = self.client.create_collection(
                 name=self.collection_name,
-                metadata={"description": "Educational bot documents collection"}
+                metadata=self._collection_metadata()
             )
+            self._distance_scale = self._distance_scale_for(self.collection)
 
+            with self._cache_lock:
+                self._doc_ids.clear()
+            self._bump_version()
             logger.info("✅ Vector store cleared")
             return True
 
@@ -15,6 +15,9 @@ from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Alias del frozenset di config: check O(1) senza lookup di attributi
+_ADMINS = admin_config.ADMIN_USER_IDS
+
 
 def admin_only(func):
     """
@@ -34,16 +37,18 @@ def admin_only(func):
     Returns:
         Wrapped function con auth check
     """
+    unauthorized_message = telegram_messages.ERROR_UNAUTHORIZED
+
     @wraps(func)
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
         user_id = user.id
 
         # Check se admin
-        if not admin_config.is_admin(user_id):
+        if user_id not in _ADMINS:
             logger.warning(f"[AUTH] Unauthorized access attempt by user {user_id} (@{user.username})")
 
-            await update.message.reply_text(telegram_messages.ERROR_UNAUTHORIZED)
+            await update.message.reply_text(unauthorized_message)
             return
 
         # Admin autorizzato, esegui comando
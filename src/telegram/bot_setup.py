@@ -8,10 +8,16 @@ from telegram.ext import Application
 
 from config import api_keys, bot_config
 from src.utils.logger import get_logger
+from src.utils.shared_clients import warm_up_openai_client
 
 logger = get_logger(__name__)
 
 
+async def _post_init(app: Application) -> None:
+    """Eseguito nell'event loop prima del polling: warm-up connessioni OpenAI."""
+    await warm_up_openai_client()
+
+
 def create_bot() -> Application:
     """
     Crea Application Telegram con configurazione ottimale.
@@ -27,7 +33,26 @@ def create_bot() -> Application:
     logger.info("[BOT SETUP] Creating Telegram Application...")
 
     # Build application
-    app = Application.builder().token(api_keys.TELEGRAM_BOT_TOKEN).build()
+    # (le richieste HTTP usano già un pool httpx persistente: connessioni
+    # TLS riusate tra gli update, download file inclusi)
+    builder = (
+        Application.builder()
+        .token(api_keys.TELEGRAM_BOT_TOKEN)
+        .post_init(_post_init)
+    )
+
+    # Bot API server locale: get_file restituisce un path sul disco e
+    # download_to_memory legge il file direttamente
+    if bot_config.LOCAL_BOT_API_URL:
+        builder = (
+            builder
+            .base_url(f"{bot_config.LOCAL_BOT_API_URL}/bot")
+            .base_file_url(f"{bot_config.LOCAL_BOT_API_URL}/file/bot")
+            .local_mode(True)
+        )
+        logger.info(f"           Local Bot API: {bot_config.LOCAL_BOT_API_URL}")
+
+    app = builder.build()
 
     # Configure concurrent updates se abilitato
     if bot_config.CONCURRENT_UPDATES:
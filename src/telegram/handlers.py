@@ -9,8 +9,12 @@ IMPORTANTE:
 - Usare decoratori @admin_only o @user_or_admin
 """
 
+import asyncio
 import os
-import tempfile
+from contextlib import asynccontextmanager
+from io import BytesIO
+from pathlib import Path
+from typing import Awaitable, Callable, Dict
 from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler, MessageHandler, filters
 
@@ -20,19 +24,105 @@ from telegram_messages import telegram_messages
 from src.telegram.auth import admin_only, user_or_admin
 from src.utils.logger import get_logger
 from src.utils.helpers import (
+    SUPPORTED_DOCUMENT_EXTENSIONS,
     extract_file_extension,
-    is_supported_document,
     format_file_size,
-    get_directory_size_mb
+    get_directory_size_mb_cached,
+    find_document_files
 )
 
 logger = get_logger(__name__)
 
+# Caratteri massimi per messaggio di /list_docs (limite Telegram: 4096)
+LIST_DOCS_MAX_CHARS = 3800
+# Caratteri massimi di nome file e summary per voce: una voce resta sempre
+# sotto LIST_DOCS_MAX_CHARS (un summary lungo non supera il limite Telegram)
+LIST_DOCS_SOURCE_MAX_CHARS = 200
+LIST_DOCS_SUMMARY_MAX_CHARS = 1000
+
+# Telegram mostra una chat action per ~5 secondi: va ripetuta durante le elaborazioni lunghe
+CHAT_ACTION_INTERVAL = 4.0
+
+# Attesa dopo l'ultima modifica documenti prima di ricreare l'agent
+# (upload a raffica → un solo refresh)
+AGENT_REFRESH_DELAY = 2.0
+
 
 # ========================================
 # HELPER FUNCTIONS
 # ========================================
 
+# Calcoli costosi in corso (chiave → task), condivisi tra richieste concorrenti
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+async def single_flight(key: str, factory: Callable[[], Awaitable]):
+    """
+    Esegue factory() una sola volta per le chiamate concorrenti con la stessa chiave.
+
+    Chi arriva mentre il calcolo è in corso attende lo stesso risultato
+    (es: più admin che premono /stats insieme → una sola scansione).
+    La cancellazione di un chiamante non interrompe il calcolo per gli altri.
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(factory())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def download_bytes(telegram_file) -> bytes:
+    """
+    Scarica un file Telegram come bytes.
+
+    Il download va in un BytesIO e getvalue() restituisce il suo buffer senza
+    copiarlo: una sola copia in memoria, contro le due di
+    bytes(await file.download_as_bytearray()).
+    """
+    buffer = BytesIO()
+    await telegram_file.download_to_memory(buffer)
+    return buffer.getvalue()
+
+
+def schedule_agent_refresh(bot_data: Dict, reason: str) -> None:
+    """
+    Programma langchain_engine.refresh_agent() dopo AGENT_REFRESH_DELAY secondi.
+
+    Ogni nuova richiesta annulla quella ancora in attesa e riparte il timer:
+    più operazioni admin ravvicinate producono un solo refresh, eseguito in un
+    thread per non bloccare l'event loop. Un refresh già partito non viene
+    annullato: quello successivo aspetta che finisca (lock).
+    """
+    langchain_engine = bot_data.get('langchain_engine')
+    if not langchain_engine:
+        return
+
+    async def refresh():
+        await asyncio.sleep(AGENT_REFRESH_DELAY)
+        # Da qui in poi non annullabile: le richieste nuove programmano un altro refresh
+        bot_data['_refresh_task'] = None
+        async with bot_data['_refresh_lock']:
+            try:
+                await asyncio.to_thread(langchain_engine.refresh_agent)
+                logger.info(f"[REFRESH] Agent refreshed after {reason}")
+            except Exception as e:
+                logger.exception(f"[ERROR] Agent refresh failed after {reason}: {e}")
+
+    pending = bot_data.get('_refresh_task')
+    if pending is not None and not pending.done():
+        pending.cancel()
+
+    bot_data['_refresh_task'] = asyncio.create_task(refresh())
+
+
+def _clip(text: str, max_chars: int) -> str:
+    """Tronca text a max_chars caratteri (con "..." se tagliato)."""
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars - 3] + "..."
+
+
 def format_error_message(error: Exception, context: str = "") -> str:
     """
     Formatta messaggio di errore in modo standardizzato.
@@ -49,6 +139,33 @@ def format_error_message(error: Exception, context: str = "") -> str:
     return f"❌ Errore: {str(error)[:200]}"
 
 
+@asynccontextmanager
+async def keep_chat_action(chat, action: str = "typing"):
+    """
+    Mostra una chat action (es: "sta scrivendo...") per tutta la durata del blocco.
+
+    L'action viene reinviata ogni CHAT_ACTION_INTERVAL secondi in un task
+    separato (che non blocca l'elaborazione) e fermata all'uscita dal blocco.
+
+    Example:
+        >>> async with keep_chat_action(update.message.chat):
+        ...     response = await message_processor.process_text(...)
+    """
+    async def refresh():
+        while True:
+            try:
+                await chat.send_action(action=action)
+            except Exception as e:
+                logger.debug(f"[ACTION] send_action failed: {e}")
+            await asyncio.sleep(CHAT_ACTION_INTERVAL)
+
+    task = asyncio.create_task(refresh())
+    try:
+        yield
+    finally:
+        task.cancel()
+
+
 # ========================================
 # ADMIN HANDLERS
 # ========================================
@@ -97,9 +214,9 @@ async def document_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Validazione
     # ========================================
 
-    # Check formato supportato
-    if not is_supported_document(filename):
-        file_ext = extract_file_extension(filename)
+    # Check formato supportato (estensione estratta una volta sola)
+    file_ext = extract_file_extension(filename)
+    if file_ext not in SUPPORTED_DOCUMENT_EXTENSIONS:
         await update.message.reply_text(
             telegram_messages.ERROR_UNSUPPORTED_FORMAT.format(file_format=file_ext)
         )
@@ -119,40 +236,41 @@ async def document_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Processing
     # ========================================
 
-    await update.message.reply_text(telegram_messages.PROCESSING_DOCUMENT)
-
-    try:
-        # Download file
+    # Download file in memoria (max MAX_FILE_SIZE_MB): niente file temporaneo
+    # da scrivere, rileggere e cancellare
+    async def download() -> BytesIO:
         file = await document.get_file()
+        file_buffer = BytesIO()
+        await file.download_to_memory(file_buffer)
+        return file_buffer
 
-        # Temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{filename}") as tmp_file:
-            await file.download_to_drive(tmp_file.name)
-            tmp_filepath = tmp_file.name
+    try:
+        # Messaggio "in elaborazione" e download in parallelo
+        _, file_buffer = await asyncio.gather(
+            update.message.reply_text(telegram_messages.PROCESSING_DOCUMENT),
+            download()
+        )
 
         # Get components from context
-        document_processor = context.bot_data['document_processor']
-        vector_store = context.bot_data['vector_store']
+        bot_data = context.bot_data
+        document_processor = bot_data['document_processor']
+        vector_store = bot_data['vector_store']
 
         # Process and add to vector store
-        doc_id, num_chunks, summary = document_processor.process_and_add(
-            filepath=tmp_filepath,
-            filename=filename,
-            vector_store=vector_store
-        )
-
-        # Cleanup temp file
-        os.remove(tmp_filepath)
-
-        # Get stats
-        stats = vector_store.get_stats()
+        async with keep_chat_action(update.message.chat, action="upload_document"):
+            doc_id, num_chunks, summary = await document_processor.process_and_add_async(
+                filepath=None,
+                filename=filename,
+                vector_store=vector_store,
+                fileobj=file_buffer
+            )
 
         # Success message con sommario
         success_message = telegram_messages.DOCUMENT_ADDED_SUCCESS.format(
             filename=filename,
             num_chunks=num_chunks,
             doc_id=doc_id,
-            total_docs=stats['total_documents']
+            total_docs=vector_store.document_count
         )
         success_message += f"\n<b>Sommario:</b> <i>{summary}</i>"
 
@@ -165,15 +283,10 @@ async def document_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # ========================================
         # Dopo l'aggiunta di un nuovo documento, ricrea l'agent per
         # assicurare che le tool descriptions includano il nuovo documento
-        langchain_engine = context.bot_data.get('langchain_engine')
-        if langchain_engine:
-            langchain_engine.refresh_agent()
-            logger.info("[REFRESH] Agent refreshed after document addition")
+        schedule_agent_refresh(bot_data, "document addition")
 
     except Exception as e:
-        logger.error(f"[ERROR] Document processing failed: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"[ERROR] Document processing failed: {e}")
 
         await update.message.reply_text(
             telegram_messages.ERROR_PROCESSING_DOCUMENT.format(error=str(e)[:200])
@@ -190,23 +303,43 @@ async def list_docs_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     vector_store = context.bot_data['vector_store']
 
     try:
-        documents = vector_store.list_all_documents()
+        # Scan dei metadata della collection: in un thread, condiviso tra /list_docs concorrenti
+        documents = await single_flight(
+            "list_docs",
+            lambda: asyncio.to_thread(vector_store.list_all_documents)
+        )
 
         if not documents:
             await update.message.reply_text(telegram_messages.NO_DOCUMENTS_FOUND)
             return
 
         # Format list usando HTML invece di Markdown per evitare problemi con caratteri speciali
-        message = f"<b>Documenti caricati ({len(documents)}):</b>\n\n"
-
-        for i, doc in enumerate(documents, 1):
-            message += f"{i}. <b>{doc['source']}</b>\n"
-            message += f"   <i>{doc.get('summary', 'No summary')}</i>\n"
-            message += f"   ID: <code>{doc['doc_id']}</code>\n"
-            message += f"   Chunks: {doc['num_chunks']}\n"
-            message += f"   Data: {doc['timestamp'][:10]}\n\n"
-
-        await update.message.reply_text(message, parse_mode='HTML')
+        entries = [
+            f"{i}. <b>{_clip(doc['source'], LIST_DOCS_SOURCE_MAX_CHARS)}</b>\n"
+            f"   <i>{_clip(doc.get('summary', 'No summary'), LIST_DOCS_SUMMARY_MAX_CHARS)}</i>\n"
+            f"   ID: <code>{doc['doc_id']}</code>\n"
+            f"   Chunks: {doc['num_chunks']}\n"
+            f"   Data: {doc['timestamp'][:10]}\n\n"
+            for i, doc in enumerate(documents, 1)
+        ]
+
+        # Più messaggi sotto il limite Telegram, divisi tra un documento e
+        # l'altro (i tag HTML restano chiusi); un solo join per messaggio
+        messages = []
+        parts = [f"<b>Documenti caricati ({len(documents)}):</b>\n\n"]
+        length = len(parts[0])
+        for entry in entries:
+            if length + len(entry) > LIST_DOCS_MAX_CHARS and parts:
+                messages.append("".join(parts))
+                parts = []
+                length = 0
+            parts.append(entry)
+            length += len(entry)
+        messages.append("".join(parts))
+
+        # In sequenza: l'ordine dei messaggi deve seguire l'elenco
+        for message in messages:
+            await update.message.reply_text(message, parse_mode='HTML')
 
     except Exception as e:
         logger.error(f"[ERROR] List docs failed: {e}")
@@ -236,40 +369,37 @@ async def delete_doc_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
     vector_store = context.bot_data['vector_store']
 
     try:
-        # Get info before delete
-        doc_info = vector_store.get_document_info(doc_id)
+        # ========================================
+        # Step 1: Delete from vector store (metadata restituiti dalla stessa lettura)
+        # ========================================
+        num_deleted, doc_metadata = await vector_store.pop_document_async(doc_id)
 
-        if not doc_info:
+        if not num_deleted:
             await update.message.reply_text(f"Documento '{doc_id}' non trovato.")
             return
 
-        # ========================================
-        # Step 1: Delete from vector store
-        # ========================================
-        num_deleted = vector_store.delete_document(doc_id)
-
         # ========================================
         # Step 2: Delete physical file from data/documents/
         # ========================================
         from config import paths_config
-        from pathlib import Path
 
-        documents_dir = Path(paths_config.DOCUMENTS_DIR)
         deleted_files = []
 
-        # Find and delete all files starting with doc_id_
-        for filepath in documents_dir.glob(f"{doc_id}_*"):
+        # Path ricavato dal nome originale (fallback: file che iniziano con doc_id_)
+        source = doc_metadata.get('source')
+        for path in find_document_files(paths_config.DOCUMENTS_DIR, doc_id, source):
+            name = os.path.basename(path)
             try:
-                filepath.unlink()  # Delete file
-                deleted_files.append(filepath.name)
-                logger.info(f"[DELETE] Removed physical file: {filepath.name}")
+                os.unlink(path)  # Delete file
+                deleted_files.append(name)
+                logger.info(f"[DELETE] Removed physical file: {name}")
             except Exception as e:
-                logger.warning(f"[WARN] Could not delete file {filepath.name}: {e}")
+                logger.warning(f"[WARN] Could not delete file {name}: {e}")
 
         # Success message
         message = telegram_messages.DOCUMENT_DELETED_SUCCESS.format(
             doc_id=doc_id,
-            filename=doc_info['source']
+            filename=doc_metadata.get('source', 'Unknown')
         )
 
         if deleted_files:
@@ -284,15 +414,10 @@ async def delete_doc_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
         # ========================================
         # Dopo l'eliminazione di un documento, ricrea l'agent per
         # assicurare che le tool descriptions riflettano i documenti attuali
-        langchain_engine = context.bot_data.get('langchain_engine')
-        if langchain_engine:
-            langchain_engine.refresh_agent()
-            logger.info("[REFRESH] Agent refreshed after document deletion")
+        schedule_agent_refresh(context.bot_data, "document deletion")
 
     except Exception as e:
-        logger.error(f"[ERROR] Delete doc failed: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"[ERROR] Delete doc failed: {e}")
         await update.message.reply_text(format_error_message(e))
 
 
@@ -317,7 +442,7 @@ async def get_doc_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         # Verifica che il documento esista nel vector store
-        doc_info = vector_store.get_document_info(doc_id)
+        doc_info = await vector_store.get_document_info_async(doc_id)
 
         if not doc_info:
             await update.message.reply_text(f"Documento '{doc_id}' non trovato.")
@@ -327,12 +452,11 @@ async def get_doc_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Find physical file in data/documents/
         # ========================================
         from config import paths_config
-        from pathlib import Path
-
-        documents_dir = Path(paths_config.DOCUMENTS_DIR)
 
-        # Find file starting with doc_id_
-        matching_files = list(documents_dir.glob(f"{doc_id}_*"))
+        # Path ricavato dal nome originale (fallback: file che iniziano con doc_id_)
+        matching_files = find_document_files(
+            paths_config.DOCUMENTS_DIR, doc_id, doc_info['source']
+        )
 
         if not matching_files:
             await update.message.reply_text(
@@ -346,30 +470,34 @@ async def get_doc_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Get first matching file
         filepath = matching_files[0]
 
-        logger.info(f"[GET_DOC] Sending document: {filepath.name}")
+        logger.info(f"[GET_DOC] Sending document: {os.path.basename(filepath)}")
 
         # ========================================
         # Send document to admin
         # ========================================
         await update.message.reply_text("📤 Invio documento...")
 
-        with open(filepath, 'rb') as doc_file:
-            await update.message.reply_document(
-                document=doc_file,
-                filename=doc_info['source'],  # Use original filename
-                caption=f"📄 Documento: <b>{doc_info['source']}</b>\n"
-                        f"ID: <code>{doc_id}</code>\n"
-                        f"Chunks: {doc_info['num_chunks']}\n"
-                        f"Data: {doc_info['timestamp'][:10]}",
-                parse_mode='HTML'
-            )
+        # PTB leggerebbe il file nell'event loop: con il Bot API server locale
+        # basta il path (il server legge dal disco), altrimenti lettura in un thread
+        if bot_config.LOCAL_BOT_API_URL:
+            document = Path(filepath)
+        else:
+            document = await asyncio.to_thread(Path(filepath).read_bytes)
+
+        await update.message.reply_document(
+            document=document,
+            filename=doc_info['source'],  # Use original filename
+            caption=f"📄 Documento: <b>{doc_info['source']}</b>\n"
+                    f"ID: <code>{doc_id}</code>\n"
+                    f"Chunks: {doc_info['num_chunks']}\n"
+                    f"Data: {doc_info['timestamp'][:10]}",
+            parse_mode='HTML'
+        )
 
         logger.info(f"[GET_DOC] Document sent successfully: {doc_id}")
 
     except Exception as e:
-        logger.error(f"[ERROR] Get doc failed: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"[ERROR] Get doc failed: {e}")
         await update.message.reply_text(f"Errore: {str(e)}")
 
 
@@ -401,7 +529,7 @@ async def modify_summary_handler(update: Update, context: ContextTypes.DEFAULT_T
 
     try:
         # Verifica che il documento esista
-        doc_info = vector_store.get_document_info(doc_id)
+        doc_info = await vector_store.get_document_info_async(doc_id)
 
         if not doc_info:
             await update.message.reply_text(f"Documento '{doc_id}' non trovato.")
@@ -421,7 +549,7 @@ async def modify_summary_handler(update: Update, context: ContextTypes.DEFAULT_T
         # ========================================
         # Update summary in vector store
         # ========================================
-        num_updated = vector_store.update_document_summary(doc_id, new_summary)
+        num_updated = await vector_store.update_document_summary_async(doc_id, new_summary)
 
         await update.message.reply_text(
             f"✅ Sommario aggiornato con successo!\n\n"
@@ -439,15 +567,10 @@ async def modify_summary_handler(update: Update, context: ContextTypes.DEFAULT_T
         # ========================================
         # Dopo la modifica del sommario, ricrea l'agent per
         # assicurare che le tool descriptions riflettano i sommari aggiornati
-        langchain_engine = context.bot_data.get('langchain_engine')
-        if langchain_engine:
-            langchain_engine.refresh_agent()
-            logger.info("[REFRESH] Agent refreshed after summary modification")
+        schedule_agent_refresh(context.bot_data, "summary modification")
 
     except Exception as e:
-        logger.error(f"[ERROR] Modify summary failed: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"[ERROR] Modify summary failed: {e}")
         await update.message.reply_text(f"Errore: {str(e)}")
 
 
@@ -458,20 +581,25 @@ async def stats_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     Admin only.
     """
-    vector_store = context.bot_data['vector_store']
+    bot_data = context.bot_data
+    vector_store = bot_data['vector_store']
+    langchain_engine = bot_data.get('langchain_engine')
+
+    async def collect():
+        # Scansioni disco in un thread (risultati condivisi per qualche secondo)
+        stats = await asyncio.to_thread(vector_store.get_stats)
+        docs_size_mb = await asyncio.to_thread(get_directory_size_mb_cached, "./data/documents")
+        return stats, docs_size_mb
 
     try:
-        stats = vector_store.get_stats()
+        # /stats concorrenti condividono la stessa raccolta
+        stats, docs_size_mb = await single_flight("stats", collect)
 
         # Calculate storage
-        docs_size_mb = get_directory_size_mb("./data/documents")
         total_size_mb = stats['storage_size_mb'] + docs_size_mb
 
         # Calculate active users from session store
-        langchain_engine = context.bot_data.get('langchain_engine')
-        active_users_count = 0
-        if langchain_engine and hasattr(langchain_engine, 'session_store'):
-            active_users_count = len(langchain_engine.session_store)
+        active_users_count = langchain_engine.active_user_count() if langchain_engine else 0
 
         message = telegram_messages.STATS_TEMPLATE.format(
             total_docs=stats['total_documents'],
@@ -482,10 +610,10 @@ async def stats_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             total_size_mb=round(total_size_mb, 2),
             limit_mb=2000,
             active_users=active_users_count,
-            admin_count=len(admin_config.ADMIN_USER_IDS),
-            llm_model=context.bot_data.get('llm_model', 'N/A'),
-            embedding_model=context.bot_data.get('embedding_model', 'N/A'),
-            rag_top_k=context.bot_data.get('rag_top_k', 'N/A')
+            admin_count=admin_config.ADMIN_COUNT,
+            llm_model=bot_data.get('llm_model', 'N/A'),
+            embedding_model=bot_data.get('embedding_model', 'N/A'),
+            rag_top_k=bot_data.get('rag_top_k', 'N/A')
         )
 
         await update.message.reply_text(message)
@@ -518,17 +646,12 @@ async def memory_stats_handler(update: Update, context: ContextTypes.DEFAULT_TYP
     try:
         # Get stats da session store
         session_store = langchain_engine.session_store
-        total_users = len(session_store)
+        total_users = langchain_engine.active_user_count()
 
         # Calculate total messages and estimate RAM
-        total_messages = 0
-        estimated_tokens = 0
-
-        for user_id, history in session_store.items():
-            msg_count = len(history.messages)
-            total_messages += msg_count
-            # Stima 150 token per messaggio
-            estimated_tokens += msg_count * 150
+        total_messages = sum(len(history.messages) for history in session_store.values())
+        # Stima 150 token per messaggio
+        estimated_tokens = total_messages * 150
 
         # Stima RAM (1 token ≈ 4 bytes)
         estimated_ram_mb = (estimated_tokens * 4) / (1024 * 1024)
@@ -557,9 +680,7 @@ async def memory_stats_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         await update.message.reply_text(message, parse_mode='Markdown')
 
     except Exception as e:
-        logger.error(f"[ERROR] Memory stats failed: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"[ERROR] Memory stats failed: {e}")
         await update.message.reply_text(f"Errore: {str(e)}")
 
 
@@ -623,8 +744,8 @@ async def voice_on_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     user_id = update.effective_user.id
 
-    # Store in user_data
-    context.user_data['voice_mode'] = True
+    # Set condiviso degli utenti con voice mode attivo
+    context.bot_data['voice_users'].add(user_id)
 
     await update.message.reply_text(telegram_messages.VOICE_ENABLED)
     logger.info(f"[VOICE] Enabled for user {user_id}")
@@ -637,7 +758,7 @@ async def voice_off_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     user_id = update.effective_user.id
 
-    context.user_data['voice_mode'] = False
+    context.bot_data['voice_users'].discard(user_id)
 
     await update.message.reply_text(telegram_messages.VOICE_DISABLED)
     logger.info(f"[VOICE] Disabled for user {user_id}")
@@ -660,34 +781,31 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     logger.info(f"[MSG] User {user_id}: '{text[:50]}...'")
 
-    # Show typing
-    await update.message.chat.send_action(action="typing")
-
     try:
         message_processor = context.bot_data['message_processor']
 
         # Check voice mode
-        voice_mode = context.user_data.get('voice_mode', False)
-
-        # Process
-        response, audio_bytes = await message_processor.process_text(
-            text=text,
-            user_id=user_id,
-            generate_audio=voice_mode
-        )
+        voice_mode = user_id in context.bot_data['voice_users']
+
+        # Process (typing visibile per tutta l'elaborazione)
+        async with keep_chat_action(update.message.chat):
+            response, audio_file = await message_processor.process_text(
+                text=text,
+                user_id=user_id,
+                generate_audio=voice_mode
+            )
 
         # Send response based on voice mode
-        if voice_mode and audio_bytes:
+        if voice_mode and audio_file:
             # Voice mode: SOLO audio (no testo)
-            await update.message.reply_voice(voice=audio_bytes)
+            with audio_file:
+                await update.message.reply_voice(voice=audio_file)
         else:
             # Modalità normale: testo con formattazione HTML
             await update.message.reply_text(response, parse_mode='HTML')
 
     except Exception as e:
-        logger.error(f"[ERROR] Message processing failed: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"[ERROR] Message processing failed: {e}")
 
         await update.message.reply_text(
             telegram_messages.ERROR_GENERIC.format(error_message=str(e)[:200])
@@ -709,20 +827,19 @@ async def image_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     logger.info(f"[IMAGE] User {user_id} sent image")
 
-    await update.message.chat.send_action(action="typing")
-
     try:
-        # Download image
-        file = await photo.get_file()
-        image_bytes = await file.download_as_bytearray()
-
-        # Process
-        message_processor = context.bot_data['message_processor']
-        analysis = await message_processor.process_image(
-            image_bytes=bytes(image_bytes),
-            caption=caption,
-            user_id=user_id
-        )
+        async with keep_chat_action(update.message.chat):
+            # Download image
+            file = await photo.get_file()
+            image_bytes = await download_bytes(file)
+
+            # Process
+            message_processor = context.bot_data['message_processor']
+            analysis = await message_processor.process_image(
+                image_bytes=image_bytes,
+                caption=caption,
+                user_id=user_id
+            )
 
         await update.message.reply_text(analysis, parse_mode='HTML')
 
@@ -744,23 +861,21 @@ async def voice_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     logger.info(f"[VOICE] User {user_id} sent voice message ({voice.duration}s)")
 
-    # Show typing
-    await update.message.chat.send_action(action="typing")
-
     try:
         message_processor = context.bot_data['message_processor']
 
-        # Download voice message
-        file = await voice.get_file()
-        audio_bytes = await file.download_as_bytearray()
+        async with keep_chat_action(update.message.chat):
+            # Download voice message
+            file = await voice.get_file()
+            audio_bytes = await download_bytes(file)
 
-        logger.info(f"[VOICE] Downloaded {len(audio_bytes)} bytes")
+            logger.info(f"[VOICE] Downloaded {len(audio_bytes)} bytes")
 
-        # Trascrizione con Whisper
-        transcribed_text = await message_processor.transcribe_audio(
-            audio_bytes=bytes(audio_bytes),
-            audio_format="ogg"  # Telegram voice messages are OGG
-        )
+            # Trascrizione con Whisper
+            transcribed_text = await message_processor.transcribe_audio(
+                audio_bytes=audio_bytes,
+                audio_format="ogg"  # Telegram voice messages are OGG
+            )
 
         if not transcribed_text:
             await update.message.reply_text(
@@ -772,33 +887,69 @@ async def voice_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.info(f"[VOICE] Transcription: '{transcribed_text}'")
 
         # Check voice mode per risposta
-        voice_mode = context.user_data.get('voice_mode', False)
+        voice_mode = user_id in context.bot_data['voice_users']
 
         # Process come messaggio testuale normale
-        response, audio_bytes = await message_processor.process_text(
-            text=transcribed_text,
-            user_id=user_id,
-            generate_audio=voice_mode
-        )
+        async with keep_chat_action(update.message.chat):
+            response, audio_file = await message_processor.process_text(
+                text=transcribed_text,
+                user_id=user_id,
+                generate_audio=voice_mode
+            )
 
         # Send response based on voice mode
-        if voice_mode and audio_bytes:
+        if voice_mode and audio_file:
             # Voice mode: SOLO audio
-            await update.message.reply_voice(voice=audio_bytes)
+            with audio_file:
+                await update.message.reply_voice(voice=audio_file)
         else:
             # Modalità normale: testo con formattazione HTML
             await update.message.reply_text(response, parse_mode='HTML')
 
     except Exception as e:
-        logger.error(f"[ERROR] Voice processing failed: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"[ERROR] Voice processing failed: {e}")
 
         await update.message.reply_text(
             f"Errore elaborazione messaggio vocale: {str(e)[:200]}"
         )
 
 
+# ========================================
+# COMMAND ROUTING
+# ========================================
+# Un solo CommandHandler per tutti i comandi: ogni update viene controllato
+# una volta (invece di 12 CommandHandler in sequenza) e instradato con un
+# lookup nel dict. I decoratori @admin_only / @user_or_admin restano sui
+# singoli handler.
+
+COMMAND_ROUTES = {
+    # Admin
+    "add_doc": add_doc_handler,
+    "list_docs": list_docs_handler,
+    "delete_doc": delete_doc_handler,
+    "get_doc": get_doc_handler,
+    "modify_summary": modify_summary_handler,
+    "stats": stats_handler,
+    "memory_stats": memory_stats_handler,
+    # User
+    "start": start_handler,
+    "help": help_handler,
+    "clear": clear_handler,
+    "voice_on": voice_on_handler,
+    "voice_off": voice_off_handler,
+}
+
+
+async def command_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Instrada "/comando[@bot] args" all'handler registrato in COMMAND_ROUTES."""
+    command = update.effective_message.text.split(maxsplit=1)[0][1:]
+    command = command.split("@", 1)[0].lower()
+
+    handler = COMMAND_ROUTES.get(command)
+    if handler:
+        await handler(update, context)
+
+
 # ========================================
 # SETUP FUNCTION
 # ========================================
@@ -822,31 +973,29 @@ def setup_handlers(app, langchain_engine, vector_store, document_processor, mess
     app.bot_data['vector_store'] = vector_store
     app.bot_data['document_processor'] = document_processor
     app.bot_data['message_processor'] = message_processor
+    # User ID con voice mode attivo: un set condiviso invece di un dict
+    # user_data creato per ogni utente che scrive
+    app.bot_data['voice_users'] = set()
+    # Refresh agent in attesa (vedi schedule_agent_refresh)
+    app.bot_data['_refresh_task'] = None
+    app.bot_data['_refresh_lock'] = asyncio.Lock()
     app.bot_data.update(config_data)
 
     # ========================================
-    # Admin Command Handlers
-    # ========================================
-    app.add_handler(CommandHandler("add_doc", add_doc_handler))
-    app.add_handler(CommandHandler("list_docs", list_docs_handler))
-    app.add_handler(CommandHandler("delete_doc", delete_doc_handler))
-    app.add_handler(CommandHandler("get_doc", get_doc_handler))
-    app.add_handler(CommandHandler("modify_summary", modify_summary_handler))
-    app.add_handler(CommandHandler("stats", stats_handler))
-    app.add_handler(CommandHandler("memory_stats", memory_stats_handler))
-
-    # ========================================
-    # User Command Handlers
+    # Command Handlers (admin + user, instradati da COMMAND_ROUTES)
     # ========================================
-    app.add_handler(CommandHandler("start", start_handler))
-    app.add_handler(CommandHandler("help", help_handler))
-    app.add_handler(CommandHandler("clear", clear_handler))
-    app.add_handler(CommandHandler("voice_on", voice_on_handler))
-    app.add_handler(CommandHandler("voice_off", voice_off_handler))
+    app.add_handler(CommandHandler(list(COMMAND_ROUTES), command_router))
 
     # ========================================
     # Message Handlers
     # ========================================
+    # Text message handler: il caso più frequente, controllato per primo
+    # (i filtri dei message handler si escludono a vicenda)
+    app.add_handler(MessageHandler(
+        filters.TEXT & ~filters.COMMAND,
+        message_handler
+    ))
+
     # Document handler (per admin)
     app.add_handler(MessageHandler(
         filters.Document.ALL,
@@ -865,15 +1014,8 @@ def setup_handlers(app, langchain_engine, vector_store, document_processor, mess
         voice_handler
     ))
 
-    # Text message handler (catch-all, deve essere ultimo!)
-    app.add_handler(MessageHandler(
-        filters.TEXT & ~filters.COMMAND,
-        message_handler
-    ))
-
     logger.info("[OK] All handlers registered")
-    logger.info("      Admin: 7 commands")
-    logger.info("      User: 5 commands")
+    logger.info(f"      Commands: {len(COMMAND_ROUTES)} (admin + user)")
     logger.info("      Message: 4 types (text, voice, image, document)")
 
 
@@ -5,16 +5,15 @@ Processa messaggi utente (testo, immagini, audio) e genera risposte.
 Integra LangChain, Vision, TTS e Speech-to-Text (Whisper).
 """
 
-from typing import Optional, Tuple
-from openai import OpenAI
-from config import api_keys, AgentConfig
+from typing import BinaryIO, Optional, Tuple
+from config import AgentConfig
 from src.utils.logger import get_logger
 from src.utils.helpers import convert_markdown_to_html
+from src.utils.shared_clients import get_openai_client
 from src.llm.audio import AudioGenerator
 from src.llm.image_processor import ImageProcessor
 
 logger = get_logger(__name__)
-client = OpenAI(api_key=api_keys.OPENAI_API_KEY)
 
 
 class MessageProcessor:
@@ -93,7 +92,7 @@ class MessageProcessor:
         text: str,
         user_id: int,
         generate_audio: bool = False
-    ) -> Tuple[str, Optional[bytes]]:
+    ) -> Tuple[str, Optional[BinaryIO]]:
         """
         Processa messaggio testuale (ASYNC) con retry automatico.
 
@@ -107,7 +106,7 @@ class MessageProcessor:
             generate_audio: Se True, genera anche audio TTS
 
         Returns:
-            Tuple (response_text, audio_bytes or None)
+            Tuple (response_text, audio file MP3 or None). Il chiamante chiude il file.
         """
         logger.info(f"[TEXT] Processing for user {user_id}")
 
@@ -164,12 +163,12 @@ class MessageProcessor:
             response = convert_markdown_to_html(response)
 
             # Generate audio se richiesto
-            audio_bytes = None
+            audio_file = None
             if generate_audio:
                 logger.info("[TTS] Generating audio response...")
-                audio_bytes = self.audio_generator.generate(response)
+                audio_file = self.audio_generator.generate(response)
 
-            return response, audio_bytes
+            return response, audio_file
 
         except Exception as e:
             logger.error(f"[ERROR] Post-processing failed: {e}")
@@ -197,13 +196,13 @@ class MessageProcessor:
         try:
             if caption:
                 # Visual Q&A
-                analysis = self.image_processor.answer_question(
+                analysis = await self.image_processor.answer_question(
                     image_bytes=image_bytes,
                     question=caption
                 )
             else:
                 # Analisi generale
-                analysis = self.image_processor.analyze_image(
+                analysis = await self.image_processor.analyze_image(
                     image_bytes=image_bytes
                 )
 
@@ -246,7 +245,7 @@ class MessageProcessor:
             audio_file.name = f"voice_message.{audio_format}"
 
             # Whisper API transcription
-            transcription = client.audio.transcriptions.create(
+            transcription = get_openai_client().audio.transcriptions.create(
                 model="whisper-1",
                 file=audio_file,
                 language="it"  # Italiano (opzionale, Whisper auto-detect)
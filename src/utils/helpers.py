@@ -8,10 +8,18 @@ Include validazione, formattazione, e operazioni comuni.
 import os
 import hashlib
 import re
+import threading
+from functools import lru_cache
 from typing import List, Dict, Optional, Any
 from datetime import datetime
-from pathlib import Path
 import tiktoken
+from cachetools import TTLCache
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str) -> tiktoken.Encoding:
+    """Encoder tiktoken per modello, caricato una sola volta (lookup + tabella BPE)."""
+    return tiktoken.encoding_for_model(model)
 
 
 def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
@@ -32,8 +40,7 @@ def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
         3
     """
     try:
-        encoding = tiktoken.encoding_for_model(model)
-        return len(encoding.encode(text))
+        return len(_get_encoding(model).encode(text))
     except Exception:
         # Fallback: stima approssimativa (1 token ≈ 4 caratteri)
         return len(text) // 4
@@ -46,7 +53,7 @@ def truncate_text(
     suffix: str = "..."
 ) -> str:
     """
-    Tronca testo a massimo N tokens.
+    Tronca testo a massimo N tokens (taglio esatto sui token del modello).
 
     Args:
         text: Testo da troncare
@@ -58,17 +65,28 @@ def truncate_text(
         Testo troncato
 
     Example:
-        >>> truncate_text("Very long text...", max_tokens=10)
+        >>> truncate_text("Very long text...", max_tokens=2)
         'Very long...'
     """
-    current_tokens = count_tokens(text, model)
+    try:
+        encoding = _get_encoding(model)
+    except Exception:
+        # Fallback: stima approssimativa (1 token ≈ 4 caratteri)
+        max_chars = max_tokens * 4
+        return text if len(text) <= max_chars else text[:max_chars] + suffix
 
-    if current_tokens <= max_tokens:
-        return text
+    # Basta tokenizzare un prefisso: un token copre raramente più di ~10 caratteri
+    prefix = text[:max_tokens * 10]
+    tokens = encoding.encode(prefix)
 
-    # Stima caratteri da mantenere (approssimativo)
-    chars_to_keep = int((max_tokens / current_tokens) * len(text))
-    return text[:chars_to_keep] + suffix
+    if len(tokens) <= max_tokens:
+        if len(prefix) == len(text):
+            return text
+        tokens = encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+
+    return encoding.decode(tokens[:max_tokens]) + suffix
 
 
 def split_text_by_length(text: str, max_length: int = 4000) -> List[str]:
@@ -195,20 +213,123 @@ def get_directory_size_mb(dirpath: str) -> float:
         >>> size >= 0
         True
     """
-    total_size = 0
-
     try:
-        for dirpath, dirnames, filenames in os.walk(dirpath):
-            for filename in filenames:
-                filepath = os.path.join(dirpath, filename)
-                if os.path.exists(filepath):
-                    total_size += os.path.getsize(filepath)
+        total_size = _scan_size(dirpath)
     except Exception:
-        pass
+        total_size = 0
 
     return total_size / (1024 * 1024)
 
 
+def _scan_size(dirpath: str) -> int:
+    """
+    Somma ricorsiva delle dimensioni dei file (bytes), con os.scandir.
+
+    Il tipo di ogni voce arriva già da scandir (niente stat per sapere se è
+    file o directory): resta una sola stat per file, invece di exists +
+    getsize di os.walk. I file spariti durante la scansione sono ignorati.
+    """
+    total_size = 0
+    with os.scandir(dirpath) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file(follow_symlinks=False):
+                    total_size += entry.stat(follow_symlinks=False).st_size
+                elif entry.is_dir(follow_symlinks=False):
+                    total_size += _scan_size(entry.path)
+            except OSError:
+                pass
+    return total_size
+
+
+# Dimensioni directory (walk + stat di ogni file): condivise per DIR_SIZE_CACHE_TTL secondi
+DIR_SIZE_CACHE_TTL = 30.0
+_dir_size_cache: TTLCache = TTLCache(maxsize=32, ttl=DIR_SIZE_CACHE_TTL)
+_dir_size_lock = threading.Lock()
+
+
+def get_directory_size_mb_cached(dirpath: str) -> float:
+    """
+    Come get_directory_size_mb, ma con risultato riusato per DIR_SIZE_CACHE_TTL secondi.
+
+    Per statistiche mostrate all'utente (/stats): un valore vecchio di
+    qualche secondo va bene, una scansione del disco a ogni richiesta no.
+
+    Args:
+        dirpath: Path directory
+
+    Returns:
+        Dimensione totale in MB
+    """
+    with _dir_size_lock:
+        size_mb = _dir_size_cache.get(dirpath)
+    if size_mb is None:
+        size_mb = get_directory_size_mb(dirpath)
+        with _dir_size_lock:
+            _dir_size_cache[dirpath] = size_mb
+    return size_mb
+
+
+def document_file_path(documents_dir: str, doc_id: str, filename: str) -> str:
+    """
+    Path del file originale di un documento ("<doc_id>_<filename sanitizzato>").
+
+    Args:
+        documents_dir: Directory documenti
+        doc_id: ID documento
+        filename: Nome file originale (metadata "source")
+
+    Returns:
+        Path del file (non verifica che esista)
+
+    Example:
+        >>> document_file_path("./data/documents", "doc_1", "my file.pdf")
+        './data/documents/doc_1_my_file.pdf'
+    """
+    return os.path.join(documents_dir, f"{doc_id}_{sanitize_filename(filename)}")
+
+
+def find_document_files(
+    documents_dir: str,
+    doc_id: str,
+    filename: Optional[str] = None
+) -> List[str]:
+    """
+    Trova i file fisici di un documento (nome "<doc_id>_<filename>").
+
+    Con il nome originale il path è noto: basta una stat, niente scan della
+    directory. Lo scan (os.scandir) resta come fallback per file salvati
+    con un nome diverso.
+
+    Args:
+        documents_dir: Directory documenti
+        doc_id: ID documento
+        filename: Nome file originale, se noto (metadata "source")
+
+    Returns:
+        Lista di path (vuota se directory o file non presenti)
+
+    Example:
+        >>> find_document_files("./data/documents", "doc_000000")
+        []
+    """
+    if filename:
+        path = document_file_path(documents_dir, doc_id, filename)
+        if os.path.isfile(path):
+            return [path]
+
+    prefix = f"{doc_id}_"
+
+    try:
+        with os.scandir(documents_dir) as it:
+            return [
+                entry.path for entry in it
+                if entry.name.startswith(prefix) and entry.is_file()
+            ]
+    except FileNotFoundError:
+        return []
+
+
 def format_timestamp(dt: datetime = None, format: str = "%Y-%m-%d %H:%M:%S") -> str:
     """
     Formatta datetime in stringa.
@@ -256,6 +377,10 @@ def parse_user_ids(ids_string: str) -> List[int]:
     return ids
 
 
+# Estensioni documento supportate (lookup O(1))
+SUPPORTED_DOCUMENT_EXTENSIONS = frozenset({"pdf", "docx", "txt", "md"})
+
+
 def extract_file_extension(filename: str) -> str:
     """
     Estrae estensione file (lowercase, senza punto).
@@ -270,7 +395,8 @@ def extract_file_extension(filename: str) -> str:
         >>> extract_file_extension("document.PDF")
         'pdf'
     """
-    return Path(filename).suffix.lower().lstrip(".")
+    # Stessa semantica di Path(filename).suffix, senza costruire un Path
+    return os.path.splitext(filename)[1].lower().lstrip(".")
 
 
 def is_supported_document(filename: str) -> bool:
@@ -289,9 +415,7 @@ def is_supported_document(filename: str) -> bool:
         >>> is_supported_document("file.exe")
         False
     """
-    supported_extensions = ["pdf", "docx", "txt", "md"]
-    ext = extract_file_extension(filename)
-    return ext in supported_extensions
+    return extract_file_extension(filename) in SUPPORTED_DOCUMENT_EXTENSIONS
 
 
 def sanitize_filename(filename: str) -> str:
@@ -656,13 +780,25 @@ def format_sources(sources: List[dict]) -> str:
     if not sources:
         return ""
 
-    citations = "\n\n📚 **Fonti:**\n"
+    # Costruisce le righe in una lista e le unisce una sola volta (evita += in loop)
+    lines = ["\n\n📚 **Fonti:**"]
     for i, source in enumerate(sources, 1):
-        filename = source.get('source', 'Unknown')
-        page = source.get('page', 'N/A')
-        citations += f"{i}. {filename} (pag. {page})\n"
+        get = source.get
+        lines.append(f"{i}. {get('source', 'Unknown')} (pag. {get('page', 'N/A')})")
+    lines.append("")
+
+    return "\n".join(lines)
 
-    return citations
+
+# Pattern errori comuni: l'indice del gruppo catturato seleziona il messaggio.
+# L'ordine dei gruppi è la priorità (rate limit > timeout > api key > quota)
+_USER_ERROR_PATTERN = re.compile(r"(rate limit)|(timeout)|(api key)|(quota)", re.IGNORECASE)
+_USER_ERROR_MESSAGES = (
+    "Troppe richieste. Attendi un momento e riprova.",
+    "Richiesta scaduta. Riprova con una query più semplice.",
+    "Errore di autenticazione API. Contatta l'amministratore.",
+    "Quota API esaurita. Contatta l'amministratore.",
+)
 
 
 def format_error_for_user(error: Exception) -> str:
@@ -682,19 +818,28 @@ def format_error_for_user(error: Exception) -> str:
         >>> format_error_for_user(error)
         'Troppe richieste. Attendi un momento e riprova.'
     """
-    error_str = str(error).lower()
-
-    # Map errori comuni a messaggi user-friendly
-    if "rate limit" in error_str:
-        return "Troppe richieste. Attendi un momento e riprova."
-    elif "timeout" in error_str:
-        return "Richiesta scaduta. Riprova con una query più semplice."
-    elif "api key" in error_str:
-        return "Errore di autenticazione API. Contatta l'amministratore."
-    elif "quota" in error_str:
-        return "Quota API esaurita. Contatta l'amministratore."
+    # Caso comune: un solo argomento stringa e __str__ standard -> è già il
+    # messaggio, niente str() dell'eccezione (può essere di molti KB)
+    args = error.args
+    if (
+        len(args) == 1
+        and isinstance(args[0], str)
+        and type(error).__str__ is BaseException.__str__
+    ):
+        error_str = args[0]
     else:
-        return f"Errore: {str(error)[:100]}"
+        error_str = str(error)
+
+    # Map errori comuni a messaggi user-friendly (una sola scansione della stringa):
+    # vince il gruppo con priorità più alta, non la prima occorrenza nel testo
+    group = min(
+        (match.lastindex for match in _USER_ERROR_PATTERN.finditer(error_str)),
+        default=None
+    )
+    if group is not None:
+        return _USER_ERROR_MESSAGES[group - 1]
+
+    return f"Errore: {error_str[:100]}"
 
 
 # ========================================
@@ -707,8 +852,12 @@ __all__ = [
     'generate_doc_id',
     'get_file_size_mb',
     'get_directory_size_mb',
+    'get_directory_size_mb_cached',
+    'document_file_path',
+    'find_document_files',
     'format_timestamp',
     'parse_user_ids',
+    'SUPPORTED_DOCUMENT_EXTENSIONS',
     'extract_file_extension',
     'is_supported_document',
     'sanitize_filename',
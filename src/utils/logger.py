@@ -5,10 +5,14 @@ Setup logging centralizzato per il bot Telegram educativo.
 Supporta logging su file e console con formattazione personalizzata.
 """
 
+import atexit
 import logging
+import queue
 import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
 from config import logging_config, paths_config
@@ -43,38 +47,16 @@ class ColoredFormatter(logging.Formatter):
         return super().format(record)
 
 
-def setup_logger(
-    name: str = "telegram_bot",
-    level: Optional[str] = None,
-    log_file: Optional[str] = None,
-    console: bool = True
-) -> logging.Logger:
-    """
-    Configura e restituisce logger personalizzato.
+# Un QueueHandler condiviso per configurazione di output (log_file, console):
+# il record viene formattato nel thread chiamante, la scrittura su console e
+# file avviene nel thread del QueueListener (l'event loop non attende l'I/O)
+_queue_handlers: Dict[Tuple[Optional[str], bool], QueueHandler] = {}
+_queue_lock = threading.Lock()
 
-    Args:
-        name: Nome del logger
-        level: Livello logging (DEBUG, INFO, WARNING, ERROR, CRITICAL)
-        log_file: Path file log (opzionale)
-        console: Se True, logga anche su console
 
-    Returns:
-        Logger configurato
-
-    Example:
-        >>> logger = setup_logger("my_module", level="DEBUG")
-        >>> logger.info("Test message")
-    """
-    # Ottieni o crea logger
-    logger = logging.getLogger(name)
-
-    # Evita duplicazione handler se già configurato
-    if logger.handlers:
-        return logger
-
-    # Imposta livello
-    log_level = level or logging_config.LEVEL
-    logger.setLevel(getattr(logging, log_level.upper()))
+def _build_handlers(log_file: Optional[str], console: bool) -> List[logging.Handler]:
+    """Crea gli handler reali (console e/o file) con i rispettivi formatter."""
+    handlers: List[logging.Handler] = []
 
     # Formato log
     log_format = logging_config.FORMAT
@@ -93,7 +75,7 @@ def setup_logger(
             datefmt=date_format
         )
         console_handler.setFormatter(console_formatter)
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
 
     # ========================================
     # Handler File (se specificato)
@@ -115,7 +97,74 @@ def setup_logger(
             datefmt=date_format
         )
         file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
+
+    return handlers
+
+
+def _get_queue_handler(log_file: Optional[str], console: bool) -> Optional[QueueHandler]:
+    """
+    QueueHandler per la configurazione di output, creato al primo uso.
+
+    Il relativo QueueListener parte subito e viene fermato all'uscita
+    (atexit), svuotando la coda.
+    """
+    key = (log_file, console)
+    with _queue_lock:
+        handler = _queue_handlers.get(key)
+        if handler is None:
+            handlers = _build_handlers(log_file, console)
+            if not handlers:
+                return None
+
+            log_queue: queue.SimpleQueue = queue.SimpleQueue()
+            listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+            listener.start()
+            atexit.register(listener.stop)
+
+            handler = QueueHandler(log_queue)
+            _queue_handlers[key] = handler
+
+        return handler
+
+
+def setup_logger(
+    name: str = "telegram_bot",
+    level: Optional[str] = None,
+    log_file: Optional[str] = None,
+    console: bool = True
+) -> logging.Logger:
+    """
+    Configura e restituisce logger personalizzato.
+
+    Args:
+        name: Nome del logger
+        level: Livello logging (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+        log_file: Path file log (opzionale)
+        console: Se True, logga anche su console
+
+    Returns:
+        Logger configurato
+
+    Example:
+        >>> logger = setup_logger("my_module", level="DEBUG")
+        >>> logger.info("Test message")
+    """
+    # Ottieni o crea logger
+    logger = logging.getLogger(name)
+
+    # Evita duplicazione handler se già configurato
+    if logger.handlers:
+        return logger
+
+    # Imposta livello
+    log_level = level or logging_config.LEVEL
+    logger.setLevel(getattr(logging, log_level.upper()))
+
+    # Console e file scritti in background (un listener per configurazione)
+    queue_handler = _get_queue_handler(log_file, console)
+    if queue_handler is not None:
+        logger.addHandler(queue_handler)
 
     # Previeni propagazione a root logger (evita duplicati)
     logger.propagate = False
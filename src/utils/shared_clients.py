@@ -10,16 +10,36 @@ IMPORTANTE:
 - Thread-safe per uso in applicazioni async
 """
 
+import importlib.util
 from typing import Optional
-from openai import OpenAI
 
-from config import api_keys
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from config import api_keys, llm_config
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 # Singleton instances
 _openai_client: Optional[OpenAI] = None
+_async_openai_client: Optional[AsyncOpenAI] = None
+
+# Connection pool condiviso: connessioni keep-alive riusate tra chiamate
+# (niente handshake TCP/TLS ripetuto per TTS, Vision, Whisper...).
+# Tutte le connessioni restano keep-alive: un burst di gather() entro
+# MAX_CONCURRENCY non riapre connessioni e non si serializza sul pool.
+_HTTP_MAX_CONNECTIONS = max(64, llm_config.MAX_CONCURRENCY)
+_HTTP_LIMITS = httpx.Limits(
+    max_connections=_HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=_HTTP_MAX_CONNECTIONS,
+    keepalive_expiry=60.0
+)
+# Read lungo: Vision e TTS possono impiegare decine di secondi
+_HTTP_TIMEOUT = httpx.Timeout(connect=10.0, read=120.0, write=30.0, pool=30.0)
+
+# HTTP/2 solo se il pacchetto opzionale 'h2' è installato
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
 
 
 def get_openai_client() -> OpenAI:
@@ -41,20 +61,78 @@ def get_openai_client() -> OpenAI:
 
     if _openai_client is None:
         logger.info("[INIT] Creating shared OpenAI client...")
-        _openai_client = OpenAI(api_key=api_keys.OPENAI_API_KEY)
-        logger.info("✅ Shared OpenAI client initialized")
+        http_client = httpx.Client(
+            http2=_HTTP2_AVAILABLE,
+            limits=_HTTP_LIMITS,
+            timeout=_HTTP_TIMEOUT
+        )
+        _openai_client = OpenAI(
+            api_key=api_keys.OPENAI_API_KEY,
+            http_client=http_client
+        )
+        logger.info(f"✅ Shared OpenAI client initialized (HTTP/2: {_HTTP2_AVAILABLE})")
 
     return _openai_client
 
 
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    Restituisce istanza singleton di AsyncOpenAI client.
+
+    Da usare negli handler async: le chiamate non bloccano l'event loop
+    e più richieste possono essere in volo contemporaneamente.
+
+    Returns:
+        AsyncOpenAI client instance (singleton)
+
+    Example:
+        >>> client = get_async_openai_client()
+        >>> response = await client.chat.completions.create(...)
+    """
+    global _async_openai_client
+
+    if _async_openai_client is None:
+        logger.info("[INIT] Creating shared AsyncOpenAI client...")
+        http_client = httpx.AsyncClient(
+            http2=_HTTP2_AVAILABLE,
+            limits=_HTTP_LIMITS,
+            timeout=_HTTP_TIMEOUT
+        )
+        _async_openai_client = AsyncOpenAI(
+            api_key=api_keys.OPENAI_API_KEY,
+            http_client=http_client
+        )
+        logger.info(f"✅ Shared AsyncOpenAI client initialized (HTTP/2: {_HTTP2_AVAILABLE})")
+
+    return _async_openai_client
+
+
+async def warm_up_openai_client() -> None:
+    """
+    Pre-riscalda il pool async con una chiamata economica (models.list).
+
+    Apre la prima connessione TCP/TLS all'avvio, così la prima richiesta
+    di un utente non paga l'handshake. Errori solo loggati (non bloccanti).
+    """
+    try:
+        await get_async_openai_client().models.list()
+        logger.info("[WARMUP] OpenAI connection pool ready")
+    except Exception as e:
+        logger.warning(f"[WARMUP] OpenAI warm-up failed: {e}")
+
+
 def reset_clients():
     """
     Reset dei client singleton (utile per testing).
 
     Forza la ricreazione dei client alla prossima chiamata.
     """
-    global _openai_client
+    global _openai_client, _async_openai_client
+    if _openai_client is not None:
+        _openai_client.close()
     _openai_client = None
+    # Il client async va chiuso con await: qui si rilascia solo il riferimento
+    _async_openai_client = None
     logger.info("[RESET] Shared clients reset")
 
 
@@ -12,6 +12,30 @@ Tips per modificare i messaggi:
 3. Testate sempre su Telegram dopo le modifiche
 """
 
+import zlib
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _decompress(data: bytes) -> str:
+    """Decomprime un messaggio (una sola volta per processo)."""
+    return zlib.decompress(data).decode('utf-8')
+
+
+class _CompressedMessage:
+    """
+    Descriptor per messaggi lunghi tenuti in RAM compressi (zlib).
+
+    Il testo viene decompresso al primo accesso e poi servito dalla cache:
+    si usa esattamente come una stringa normale (es: telegram_messages.WELCOME_USER).
+    """
+
+    def __init__(self, text: str):
+        self._data = zlib.compress(text.encode('utf-8'), level=9)
+
+    def __get__(self, obj, objtype=None) -> str:
+        return _decompress(self._data)
+
 
 class TelegramMessages:
     """
@@ -25,7 +49,7 @@ class TelegramMessages:
     # WELCOME MESSAGES
     # =========================================
 
-    WELCOME_USER = """👋 Ciao! Sono un bot educativo AI con capacità RAG.
+    WELCOME_USER = _CompressedMessage("""👋 Ciao! Sono un bot educativo AI con capacità RAG.
 
 Posso aiutarti a:
 📚 Rispondere domande sui documenti caricati dagli admin
@@ -39,9 +63,9 @@ Comandi disponibili:
 /help - Mostra tutti i comandi
 /clear - Cancella cronologia conversazione
 /voice_on - Attiva risposte vocali
-/voice_off - Disattiva risposte vocali"""
+/voice_off - Disattiva risposte vocali""")
 
-    WELCOME_ADMIN = """👋 Ciao Admin! Sono il bot educativo AI con capacità RAG.
+    WELCOME_ADMIN = _CompressedMessage("""👋 Ciao Admin! Sono il bot educativo AI con capacità RAG.
 
 🔧 COMANDI ADMIN:
 /add_doc - Carica nuovo documento (PDF, DOCX, TXT, MD)
@@ -58,13 +82,13 @@ Comandi disponibili:
 /voice_on - Attiva audio
 /voice_off - Disattiva audio
 
-Inizia caricando documenti con /add_doc oppure chiedimi qualcosa!"""
+Inizia caricando documenti con /add_doc oppure chiedimi qualcosa!""")
 
     # =========================================
     # HELP MESSAGES
     # =========================================
 
-    HELP_MESSAGE_USER = """📖 GUIDA BOT EDUCATIVO
+    HELP_MESSAGE_USER = _CompressedMessage("""📖 GUIDA BOT EDUCATIVO
 
 🎯 COSA POSSO FARE:
 • Rispondere domande sui documenti caricati
@@ -86,9 +110,9 @@ Inizia caricando documenti con /add_doc oppure chiedimi qualcosa!"""
 💡 TIPS:
 • Sii specifico nelle domande per risposte migliori
 • Puoi fare domande di follow-up sulla conversazione
-• Le immagini vanno inviate come "documento" per qualità migliore"""
+• Le immagini vanno inviate come "documento" per qualità migliore""")
 
-    HELP_MESSAGE_ADMIN = """📖 GUIDA BOT EDUCATIVO (ADMIN)
+    HELP_MESSAGE_ADMIN = _CompressedMessage("""📖 GUIDA BOT EDUCATIVO (ADMIN)
 
 🔧 COMANDI AMMINISTRATIVI:
 /add_doc - Inizia caricamento documento
@@ -134,7 +158,7 @@ Inizia caricando documenti con /add_doc oppure chiedimi qualcosa!"""
 3. Modifica sommario se necessario con /modify_summary
 4. Scarica documenti originali con /get_doc
 5. Gli utenti possono subito fare query RAG
-6. Elimina documenti obsoleti con /delete_doc"""
+6. Elimina documenti obsoleti con /delete_doc""")
 
     # =========================================
     # STATUS MESSAGES
@@ -247,7 +271,7 @@ Possiamo ricominciare da zero. Come posso aiutarti?"""
     # STATS MESSAGES
     # =========================================
 
-    STATS_TEMPLATE = """📊 STATISTICHE SISTEMA
+    STATS_TEMPLATE = _CompressedMessage("""📊 STATISTICHE SISTEMA
 
 🗄️ DATABASE:
 • Documenti totali: {total_docs}
@@ -266,7 +290,7 @@ Possiamo ricominciare da zero. Come posso aiutarti?"""
 🤖 SISTEMA:
 • LLM Model: {llm_model}
 • Embedding Model: {embedding_model}
-• RAG Top-K: {rag_top_k}"""
+• RAG Top-K: {rag_top_k}""")
 
 
 # =========================================
@@ -277,13 +301,7 @@ telegram_messages = TelegramMessages()
 
 if __name__ == "__main__":
     # Test messages module
-    import sys
-    if hasattr(sys.stdout, 'reconfigure'):
-        try:
-            sys.stdout.reconfigure(encoding='utf-8')
-        except:
-            pass
-
+    # Su Windows: PYTHONUTF8=1 per stampare le emoji (vedi README)
     print("Testing telegram_messages module...")
     print("\n=== WELCOME MESSAGE ===")
     print(telegram_messages.WELCOME_USER)